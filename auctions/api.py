@@ -0,0 +1,204 @@
+import json
+
+from django.db.models import Count, F, Max
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
+
+from . import caching, categories, watchlist
+from .models import AuctionListing, Comment
+from .numbers import max_integer, parse_whole_number
+from .pagination import get_cursor, keyset_page
+from .services import BidRejected, place_bid
+
+# JSON endpoints for mobile and partner clients. Payloads are built from values()
+# rows rather than model instances, lists are keyset-paginated like the HTML grids,
+# and GETs answer If-None-Match with a 304. Writes are authenticated by the site's
+# session and, like its forms, need the CSRF token.
+
+LISTING_FIELDS = ("id", "title", "image_url", "bid_count", "is_active", "ends_at")
+LISTING_RENAMED = {
+    "price": F("current_price"),
+    # Named apart from the foreign keys, which values() will not let an alias shadow
+    "category_name": F("category__category_name"),
+    "owner_name": F("owner__username"),
+}
+
+LISTING_DETAIL_FIELDS = (*LISTING_FIELDS, "description", "watcher_count", "last_bid_at", "closed_at", "updated_at")
+LISTING_DETAIL_RENAMED = {**LISTING_RENAMED, "winner_name": F("winner__username")}
+
+
+def _error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+# The body of a write, sent either as JSON or as a form
+def _payload(request):
+    if request.content_type == "application/json":
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError:
+            return {}
+        return payload if isinstance(payload, dict) else {}
+    return request.POST
+
+
+# One page of values() rows, with the URL of the next page if there is one
+def _page_response(request, queryset):
+    page = keyset_page(queryset, get_cursor(request))
+    next_url = None
+    if page.next_cursor is not None:
+        query = request.GET.copy()
+        query["after"] = page.next_cursor
+        next_url = f"{request.path}?{query.urlencode()}"
+    return JsonResponse({"results": page.items, "next": next_url})
+
+
+# The cache scopes a listing list depends on, from its ?category= and ?closed= filters.
+# Every list carries category names.
+def _list_scopes(request):
+    scopes = [
+        caching.CLOSED_LISTINGS if request.GET.get("closed") == "1" else caching.ACTIVE_LISTINGS,
+        caching.CATEGORIES,
+    ]
+    category = categories.registry.get(request.GET.get("category"))
+    if category is not None:
+        scopes.append(caching.category_scope(category.id))
+    return scopes
+
+
+# Any change to the listings behind a list moves one of its scope versions, so the
+# versions make an ETag that needs no query
+def _listings_etag(request):
+    return "-".join(str(caching.get_version(scope)) for scope in _list_scopes(request))
+
+
+# API view to list active (or with ?closed=1, closed) listings, optionally of one category
+@require_http_methods(["GET", "HEAD"])
+@cache_control(max_age=0, must_revalidate=True)
+@condition(etag_func=_listings_etag)
+def listings(request):
+    queryset = AuctionListing.objects.closed() if request.GET.get("closed") == "1" else AuctionListing.objects.active()
+    if "category" in request.GET:
+        category = categories.registry.get(request.GET["category"])
+        if category is None:
+            return _error("No category matches the given query.", 404)
+        queryset = queryset.filter(category=category)
+    return _page_response(request, queryset.values(*LISTING_FIELDS, **LISTING_RENAMED))
+
+
+# The listing row, read once per request and shared by the ETag function and the view
+def _listing_row(request, id):
+    if not hasattr(request, "_listing_row"):
+        row = AuctionListing.objects.filter(pk=id).values(*LISTING_DETAIL_FIELDS, **LISTING_DETAIL_RENAMED).first()
+        if row is not None and request.user.is_authenticated:
+            row["watching"] = watchlist.is_watching(request.user, id)
+        request._listing_row = row
+    return request._listing_row
+
+
+def _listing_etag(request, id):
+    row = _listing_row(request, id)
+    if row is None:
+        return None
+    return f"{row['updated_at'].timestamp()}-{row['watcher_count']}-{row.get('watching', 'anon')}"
+
+
+# API view to fetch one listing
+@require_http_methods(["GET", "HEAD"])
+@cache_control(max_age=0, must_revalidate=True)
+@condition(etag_func=_listing_etag)
+def listing(request, id):
+    row = _listing_row(request, id)
+    if row is None:
+        return _error("No auction listing matches the given query.", 404)
+    return JsonResponse(row)
+
+
+# API view to place a bid: {"amount": 120}
+@require_http_methods(["POST"])
+def bids(request, id):
+    if not request.user.is_authenticated:
+        return _error("You need to be logged in to place a bid.", 401)
+    amount = parse_whole_number(_payload(request).get("amount"))
+    if amount is None:
+        return _error(f"The amount must be a whole number from 0 to {max_integer()}.", 400)
+    try:
+        new_bid = place_bid(id, request.user, amount)
+    except AuctionListing.DoesNotExist:
+        return _error("No auction listing matches the given query.", 404)
+    except BidRejected as error:
+        return _error(str(error), 409)
+    return JsonResponse({"id": new_bid.pk, "amount": new_bid.bid, "created_at": new_bid.created_at}, status=201)
+
+
+# How many comments the listing has and the newest comment id, or None if there is no
+# such listing. Read in one query, once per GET, and shared by the ETag function and the view.
+def _comments_state(request, id):
+    if not hasattr(request, "_comments_state"):
+        request._comments_state = (
+            AuctionListing.objects.filter(pk=id)
+            .annotate(total=Count("listing_comment"), newest=Max("listing_comment"))
+            .values_list("total", "newest")
+            .first()
+        )
+    return request._comments_state
+
+
+def _comments_etag(request, id):
+    # Writes are not conditional, and a missing listing gets no ETag to revalidate
+    if request.method not in ("GET", "HEAD"):
+        return None
+    state = _comments_state(request, id)
+    if state is None:
+        return None
+    # Comments are added and deleted but never edited. A new comment moves the
+    # newest id and a deleted one lowers the count, so together they identify the list.
+    total, newest = state
+    return f"{total}-{newest or 0}"
+
+
+# API view to list a listing's comments, or add one: {"message": "..."}
+@require_http_methods(["GET", "HEAD", "POST"])
+@cache_control(max_age=0, must_revalidate=True)
+@condition(etag_func=_comments_etag)
+def comments(request, id):
+    if request.method != "POST":
+        if _comments_state(request, id) is None:
+            return _error("No auction listing matches the given query.", 404)
+        queryset = Comment.objects.filter(listing_id=id).values("id", "message", "created_at", author_name=F("author__username"))
+        return _page_response(request, queryset)
+
+    if not AuctionListing.objects.filter(pk=id).exists():
+        return _error("No auction listing matches the given query.", 404)
+    if not request.user.is_authenticated:
+        return _error("You need to be logged in to comment.", 401)
+    message = str(_payload(request).get("message", "")).strip()
+    if not message:
+        return _error("Comment cannot be empty.", 400)
+    if len(message) > Comment._meta.get_field("message").max_length:
+        return _error("Comment is too long.", 400)
+    comment = Comment.objects.create(author=request.user, listing_id=id, message=message)
+    return JsonResponse({
+        "id": comment.pk,
+        "message": comment.message,
+        "created_at": comment.created_at,
+        "author_name": request.user.username,
+    }, status=201)
+
+
+# API view to toggle a listing on the user's watchlist: POST adds it, DELETE removes it
+@require_http_methods(["POST", "DELETE"])
+def watch(request, id):
+    if not request.user.is_authenticated:
+        return _error("You need to be logged in to use the watchlist.", 401)
+    if request.method == "POST":
+        try:
+            watchlist.watch(request.user, id)
+        except AuctionListing.DoesNotExist:
+            return _error("No auction listing matches the given query.", 404)
+        return JsonResponse({"watching": True})
+    if not AuctionListing.objects.filter(pk=id).exists():
+        return _error("No auction listing matches the given query.", 404)
+    watchlist.unwatch(request.user, id)
+    return JsonResponse({"watching": False})
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class AuctionsConfig(AppConfig):
     name = 'auctions'
+
+    def ready(self):
+        # Connect the cache invalidation receivers
+        from . import signals  # noqa: F401
+        # Time the queries of every connection for RequestTimingMiddleware
+        from . import instrumentation  # noqa: F401
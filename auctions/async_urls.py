@@ -0,0 +1,20 @@
+from django.urls import path
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+# The URLs of urls.py, with the read-heavy pages served by their async counterparts.
+# commerce/asgi.py routes ASGI requests through this module when AUCTIONS_ASYNC_VIEWS is set.
+ASYNC_VIEWS = {
+    "index": async_views.index,
+    "display": async_views.display,
+    "category": async_views.category_view,
+    "listing": async_views.listing_view,
+    "watchlist": async_views.watchlist_view,
+    "closed_auctions": async_views.closed_auctions_view,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name) if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,175 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from . import caching, categories, comments, watchlist
+from .models import AuctionListing
+from .pagination import akeyset_page, get_cursor
+from .views import _build_category_etag
+
+# Async counterparts of the read-heavy views in views.py, routed by async_urls.py
+# when the site is served over ASGI. They query through the async ORM interface and
+# must not touch anything lazy that would query from the event loop.
+#
+# On Django 4.2 every async ORM call is a thread-sensitive sync_to_async, so all of
+# a request's queries still run one after another in a single thread. Gathering
+# them saves no time, and bench_asgi measures these views no faster than the sync
+# ones, which is why commerce/asgi.py only routes here when asked to.
+
+
+# Django 4.2 has no request.auser(). Load the user, and with it the session that
+# messages are read from, in a worker thread once so the rest of the view and the
+# templates never query from the event loop.
+@sync_to_async
+def _get_user(request):
+    request.user.is_authenticated
+    return request.user
+
+
+async def _list(queryset):
+    return [item async for item in queryset]
+
+
+# Async version of views._cached_grid
+async def _cached_grid(request, template_name, scopes, listings):
+    after = get_cursor(request)
+
+    async def render_grid():
+        page = await akeyset_page(listings, after)
+        html = render_to_string(template_name, {
+            "listings": page,
+            "closed_listings": page,
+        }, request=request)
+        return {"html": html, "count": len(page)}
+
+    return await caching.aget_or_render(template_name, scopes, (scopes, after), render_grid)
+
+
+# View to display a specific auction listing
+async def listing_view(request, id):
+    user = await _get_user(request)
+    # The listing, its first comments, their count and the watchlist check only
+    # depend on the id. They are gathered, but still run one at a time (see above).
+    listing_data, all_comments, comment_count, check_listing_in_watchlist = await asyncio.gather(
+        AuctionListing.objects.for_detail().filter(pk=id).afirst(),
+        comments.acomment_page(id),
+        comments.acomment_count(id),
+        watchlist.ais_watching(user, id),
+    )
+    if listing_data is None:
+        raise Http404("No auction listing matches the given query.")
+    return render(request, "auctions/listing.html", {
+        "listing": listing_data,
+        "check_listing_in_watchlist": check_listing_in_watchlist,
+        "all_comments": all_comments,
+        "comment_count": comment_count,
+        "is_owner": user.is_authenticated and user.pk == listing_data.owner_id,
+    })
+
+
+# View to display the current user's watchlist
+async def watchlist_view(request):
+    user = await _get_user(request)
+    if not user.is_authenticated:
+        return HttpResponseRedirect(reverse("login"))
+    listings = await _list(AuctionListing.objects.active().filter(watchlist=user).cards())
+    return render(request, "auctions/watchlist.html", {
+        "listings": listings
+    })
+
+
+# View to display all active auction listings on the homepage
+async def index(request):
+    user = await _get_user(request)
+    grid, watched_ids = await asyncio.gather(
+        _cached_grid(
+            request, "auctions/index_grid.html", [caching.ACTIVE_LISTINGS], AuctionListing.objects.active().cards()
+        ),
+        watchlist.awatched_ids(user),
+    )
+    return render(request, "auctions/index.html", {
+        "grid": grid,
+        "watched_ids": sorted(watched_ids),
+    })
+
+
+# View to browse all active auction listings by category
+async def display(request):
+    # Filters used to arrive by POST or ?category=; send them to the bookmarkable category URL
+    category_id = request.POST.get('category') or request.GET.get('category')
+    if category_id:
+        category = await categories.registry.aget(category_id)
+        if category is None:
+            raise Http404("No category matches the given query.")
+        return HttpResponseRedirect(reverse("category", args=(category.id, )), status=303)
+
+    user = await _get_user(request)
+    return await _render_display(request, user, await watchlist.awatched_ids(user))
+
+
+# Async version of views._render_display
+async def _render_display(request, user, watched_ids, category=None):
+    if category is not None:
+        active_listings = AuctionListing.objects.active().filter(category=category).cards()
+        scopes = [caching.category_scope(category.id)]
+    else:
+        active_listings = AuctionListing.objects.active().cards()
+        scopes = [caching.ACTIVE_LISTINGS]
+
+    grid, all_categories = await asyncio.gather(
+        _cached_grid(request, "auctions/display_grid.html", scopes, active_listings),
+        categories.registry.aall(),
+    )
+    return render(request, "auctions/display.html", {
+        "grid": grid,
+        "categories": all_categories,
+        "selected_category": category,
+        "watched_ids": sorted(watched_ids),
+    })
+
+
+# View to filter auction listings based on category. Django 4.2's condition and
+# cache_control decorators cannot wrap a coroutine, so the validators of
+# views.category_view are checked here by hand.
+async def category_view(request, category_id):
+    user = await _get_user(request)
+    category = await categories.registry.aget(category_id)
+    if category is None:
+        raise Http404("No category matches the given query.")
+    state = await AuctionListing.objects.filter(category_id=category_id).aaggregate(
+        last_modified=Max("updated_at"), total=Count("id")
+    )
+    watched_ids = await watchlist.awatched_ids(user)
+    etag = quote_etag(_build_category_etag(category_id, state, user, watched_ids))
+    last_modified = int(state["last_modified"].timestamp()) if state["last_modified"] else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await _render_display(request, user, watched_ids, category)
+    if request.method in ("GET", "HEAD"):
+        if last_modified and not response.has_header("Last-Modified"):
+            response.headers["Last-Modified"] = http_date(last_modified)
+        response.headers.setdefault("ETag", etag)
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
+
+
+# View to display all closed auction listings
+async def closed_auctions_view(request):
+    await _get_user(request)
+    grid = await _cached_grid(
+        request,
+        "auctions/closed_grid.html",
+        [caching.CLOSED_LISTINGS],
+        AuctionListing.objects.closed().cards("description"),
+    )
+    return render(request, "auctions/closed_auctions.html", {
+        "grid": grid,
+    })
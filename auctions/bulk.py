@@ -0,0 +1,217 @@
+import csv
+import itertools
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching
+from .models import AuctionListing, Category
+from .numbers import max_integer, parse_whole_number
+
+# Bulk import and export of listings, for onboarding sellers with large catalogues.
+# Both directions stream: rows are read, validated and inserted one chunk at a time,
+# and exports walk the table with a server-side iterator, so memory stays flat
+# however long the file is.
+
+FORMATS = ("csv", "jsonl")
+
+# Columns an import reads; anything else in the file (such as the extra columns an
+# export writes) is ignored
+IMPORT_FIELDS = ("title", "description", "image_url", "price", "category", "ends_at")
+
+EXPORT_FIELDS = (
+    "id", "title", "description", "image_url", "price", "category", "owner", "ends_at", "is_active", "bid_count",
+)
+# values_list() paths of EXPORT_FIELDS, in the same order
+_EXPORT_COLUMNS = (
+    "id", "title", "description", "image_url", "current_price", "category__category_name", "owner__username",
+    "ends_at", "is_active", "bid_count",
+)
+
+# Reporting columns of a closed auction
+CLOSED_AUCTION_FIELDS = ("id", "title", "category", "owner", "winner", "final_price", "bid_count", "closed_at")
+_CLOSED_AUCTION_COLUMNS = (
+    "id", "title", "category__category_name", "owner__username", "winner__username", "current_price", "bid_count",
+    "closed_at",
+)
+
+_validate_url = URLValidator()
+
+
+class RowError(Exception):
+    """Raised when a line of an import file does not describe a valid listing."""
+
+
+# The format named by a path's extension, for commands that take either
+def format_for(path, default="csv"):
+    for name in FORMATS:
+        if str(path).endswith(f".{name}"):
+            return name
+    return default
+
+
+# Yield (line number, dict) for every record of a CSV (with a header row) or JSONL
+# file. Malformed JSON is yielded as a RowError in place of the dict.
+def read_rows(lines, format):
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield line_number, RowError(f"invalid JSON: {error}")
+            continue
+        yield line_number, row if isinstance(row, dict) else RowError("expected a JSON object")
+
+
+def _text(row, field, max_length):
+    value = row.get(field)
+    value = "" if value is None else str(value).strip()
+    if not value:
+        raise RowError(f"{field} is required")
+    if len(value) > max_length:
+        raise RowError(f"{field} is longer than {max_length} characters")
+    return value
+
+
+# Turn one record into an unsaved AuctionListing. Categories are looked up by name,
+# case-insensitively, in the in-memory map instead of querying per row.
+def build_listing(row, category_ids, owner, now):
+    title = _text(row, "title", AuctionListing._meta.get_field("title").max_length)
+    description = _text(row, "description", AuctionListing._meta.get_field("description").max_length)
+    image_url = _text(row, "image_url", AuctionListing._meta.get_field("image_url").max_length)
+    try:
+        _validate_url(image_url)
+    except ValidationError:
+        raise RowError("image_url is not a valid URL")
+
+    price = parse_whole_number(row.get("price"))
+    if price is None:
+        raise RowError(f"price must be a whole number from 0 to {max_integer()}")
+
+    category_name = _text(row, "category", Category._meta.get_field("category_name").max_length)
+    category_id = category_ids.get(category_name.casefold())
+    if category_id is None:
+        raise RowError(f"unknown category {category_name!r}")
+
+    # Like create_listing, the end time is optional but must lie in the future
+    ends_at = row.get("ends_at") or None
+    if ends_at is not None:
+        ends_at = parse_datetime(str(ends_at))
+        if ends_at is not None and timezone.is_naive(ends_at):
+            ends_at = timezone.make_aware(ends_at)
+        if ends_at is None or ends_at <= now:
+            raise RowError("ends_at must be a date and time in the future")
+
+    return AuctionListing(
+        title=title,
+        description=description,
+        image_url=image_url,
+        current_price=price,
+        category_id=category_id,
+        owner=owner,
+        ends_at=ends_at,
+    )
+
+
+# Casefolded category name to id, for resolving the category column without queries
+def category_map():
+    return {name.casefold(): category_id for category_id, name in Category.objects.values_list("id", "category_name")}
+
+
+# Import listings owned by `owner` from (line number, record) pairs, inserting them
+# with bulk_create in transactions of chunk_size rows. Invalid records are skipped
+# and passed to on_error(line_number, message) as they are found. Yields the numbers
+# of listings created and records rejected as each chunk is committed.
+def import_chunks(rows, owner, chunk_size=1000, create_categories=False, on_error=None):
+    category_ids = category_map()
+    max_name_length = Category._meta.get_field("category_name").max_length
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        now = timezone.now()
+        listings = []
+        for line_number, row in chunk:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                name = str(row.get("category") or "").strip()
+                if create_categories and 0 < len(name) <= max_name_length and name.casefold() not in category_ids:
+                    # Saved one at a time so the Category receivers refresh the registry and menus
+                    category_ids[name.casefold()] = Category.objects.create(category_name=name).id
+                listings.append(build_listing(row, category_ids, owner, now))
+            except RowError as error:
+                if on_error is not None:
+                    on_error(line_number, str(error))
+        if listings:
+            with transaction.atomic():
+                AuctionListing.objects.bulk_create(listings)
+                # bulk_create sends no post_save, so the grid caches the listing
+                # receivers would have invalidated are bumped here, once per chunk
+                category_scopes = {caching.category_scope(listing.category_id) for listing in listings}
+                transaction.on_commit(lambda scopes=category_scopes: caching.bump_versions(
+                    caching.ACTIVE_LISTINGS, *scopes
+                ))
+        yield len(listings), len(chunk) - len(listings)
+
+
+# import_chunks() run to the end. Returns the totals created and rejected.
+def import_listings(rows, owner, **options):
+    created = rejected = 0
+    for chunk_created, chunk_rejected in import_chunks(rows, owner, **options):
+        created += chunk_created
+        rejected += chunk_rejected
+    return created, rejected
+
+
+class _Echo:
+    # The file-like object csv.writer wants, handing each line straight back
+    def write(self, value):
+        return value
+
+
+# Encode rows (sequences ordered like fields) as CSV with a header, or as JSON lines,
+# one string per row so the output can be streamed to a file or a response
+def encode_rows(rows, fields, format):
+    if format == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow(row)
+        return
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + "\n"
+
+
+# Every listing in the queryset as an EXPORT_FIELDS row, read chunk_size rows at a time
+def export_rows(queryset, chunk_size=2000):
+    return queryset.order_by("id").values_list(*_EXPORT_COLUMNS).iterator(chunk_size=chunk_size)
+
+
+# Every closed auction as a CLOSED_AUCTION_FIELDS row, in id order along the closed
+# listings index, read chunk_size rows at a time
+def closed_auction_rows(chunk_size=2000):
+    return (
+        AuctionListing.objects.closed()
+        .order_by("id")
+        .values_list(*_CLOSED_AUCTION_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+# Join encoded lines into blocks of `size`, so a streamed response is written in a
+# few large pieces rather than one per row
+def join_lines(lines, size=500):
+    lines = iter(lines)
+    while block := "".join(itertools.islice(lines, size)):
+        yield block
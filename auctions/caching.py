@@ -0,0 +1,100 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .routers import primary
+
+
+# Scopes that cached fragments depend on. Bumping a scope's version orphans
+# every fragment rendered under the old version, which then simply expires.
+ACTIVE_LISTINGS = "active"
+CLOSED_LISTINGS = "closed"
+CATEGORIES = "categories"
+
+STATS_KEYS = {"hits": "auctions:cache-stats:hits", "misses": "auctions:cache-stats:misses"}
+
+
+def category_scope(category_id):
+    return f"category:{category_id}"
+
+
+def _version_key(scope):
+    return f"auctions:version:{scope}"
+
+
+# Current version of a scope. A missing version starts from the clock rather than
+# from 1, so an evicted counter can never line up with fragments cached before it.
+def get_version(scope):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+# Move each scope to a fresh clock reading. incr() on a file cache is a read and a
+# write, so two processes bumping at once could both land on the same version.
+def bump_versions(*scopes):
+    cache.set_many({_version_key(scope): time.time_ns() for scope in scopes}, None)
+
+
+def _count(stat):
+    key = STATS_KEYS[stat]
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+# Hit and miss counters, shared by every process when a file cache is configured
+def get_stats():
+    values = cache.get_many(STATS_KEYS.values())
+    return {stat: values.get(key, 0) for stat, key in STATS_KEYS.items()}
+
+
+def reset_stats():
+    cache.delete_many(STATS_KEYS.values())
+
+
+def _fragment_key(name, scopes, parts):
+    versions = "-".join(str(get_version(scope)) for scope in scopes)
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f"auctions:fragment:{name}:{versions}:{digest}"
+
+
+# Return the cached value for a fragment, calling render() to build it on a miss.
+# The key combines the fragment name, the versions of the scopes it depends on
+# and the request parts (category, cursor) that select it. Fragments are rendered
+# from the primary: a lagging replica would cache stale cards under a new version.
+def get_or_render(name, scopes, parts, render):
+    key = _fragment_key(name, scopes, parts)
+    value = cache.get(key)
+    if value is None:
+        _count("misses")
+        with primary():
+            value = render()
+        cache.set(key, value, settings.AUCTIONS_FRAGMENT_CACHE_TIMEOUT)
+    else:
+        _count("hits")
+    return value
+
+
+# get_or_render() for async views, awaiting an async render() on a miss. The cache
+# is a small file on the local disk, usually read from the page cache, so lookups are
+# called directly rather than through the cache's a*() methods, which would each cost
+# a hop to a worker thread.
+async def aget_or_render(name, scopes, parts, render):
+    key = _fragment_key(name, scopes, parts)
+    value = cache.get(key)
+    if value is None:
+        _count("misses")
+        with primary():
+            value = await render()
+        cache.set(key, value, settings.AUCTIONS_FRAGMENT_CACHE_TIMEOUT)
+    else:
+        _count("hits")
+    return value
@@ -0,0 +1,29 @@
+import itertools
+from dataclasses import dataclass
+
+from django.db.models.query import BaseIterable, ValuesListIterable
+
+# The columns a listing card renders, in ListingCard field order. The owner and the
+# category come back as the names the cards print, read through the joins.
+CARD_FIELDS = ("id", "title", "image_url", "current_price", "owner__username", "category__category_name")
+
+
+@dataclass(slots=True)
+class ListingCard:
+    """One listing as a grid renders it: plain values, without a model instance behind them."""
+
+    id: int
+    title: str
+    image_url: str
+    current_price: int
+    owner: str | None
+    category: str | None
+    description: str = ""
+
+
+class CardIterable(BaseIterable):
+    """Yield a ListingCard for each row of values_list(*CARD_FIELDS, *extra card fields)."""
+
+    def __iter__(self):
+        rows = ValuesListIterable(self.queryset, self.chunked_fetch, self.chunk_size)
+        return itertools.starmap(ListingCard, rows)
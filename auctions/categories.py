@@ -0,0 +1,99 @@
+import threading
+import time
+
+from django.conf import settings
+
+from . import caching
+from .models import Category
+from .routers import primary
+
+# An id missing from the copy may be a category another process just added, so a
+# miss reloads, but no more than once per this many seconds
+MISS_RELOAD_INTERVAL = 1
+
+
+class CategoryRegistry:
+    """
+    In-process copy of the category table.
+
+    Categories almost never change, so each process keeps them in memory and only
+    reloads when the categories version stamp in the shared cache moves, which the
+    Category save/delete receivers in signals.py take care of. Reloads read the
+    primary, so a lagging replica cannot pin an old copy to the new version.
+
+    The version stamp is only shared when the cache is, so the copy is also reloaded
+    once it is AUCTIONS_CATEGORY_MAX_AGE seconds old, and when an id is not in it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._categories = []
+        self._by_id = {}
+        self._loaded_at = 0.0
+
+    def _is_current(self, version, max_age):
+        return version == self._version and time.monotonic() - self._loaded_at < max_age
+
+    def _refresh(self, max_age=None):
+        if max_age is None:
+            max_age = settings.AUCTIONS_CATEGORY_MAX_AGE
+        version = caching.get_version(caching.CATEGORIES)
+        if self._is_current(version, max_age):
+            return
+        with self._lock:
+            if self._is_current(version, max_age):
+                return
+            with primary():
+                self._load(version, list(Category.objects.all()))
+
+    # The lock cannot be held across an await, so concurrent reloads from async
+    # views may both query the table; either result is current
+    async def _arefresh(self, max_age=None):
+        if max_age is None:
+            max_age = settings.AUCTIONS_CATEGORY_MAX_AGE
+        version = caching.get_version(caching.CATEGORIES)
+        if self._is_current(version, max_age):
+            return
+        with primary():
+            self._load(version, [category async for category in Category.objects.all()])
+
+    def _load(self, version, categories):
+        # Swap in complete structures so concurrent readers never see a half-built registry
+        self._categories = categories
+        self._by_id = {category.id: category for category in categories}
+        self._version = version
+        self._loaded_at = time.monotonic()
+
+    # Every category, ordered as the database returns them
+    def all(self):
+        self._refresh()
+        return self._categories
+
+    # The category with the given id (int or string from a form), or None
+    def get(self, category_id):
+        try:
+            category_id = int(category_id)
+        except (TypeError, ValueError):
+            return None
+        self._refresh()
+        if category_id not in self._by_id:
+            self._refresh(MISS_RELOAD_INTERVAL)
+        return self._by_id.get(category_id)
+
+    async def aall(self):
+        await self._arefresh()
+        return self._categories
+
+    async def aget(self, category_id):
+        try:
+            category_id = int(category_id)
+        except (TypeError, ValueError):
+            return None
+        await self._arefresh()
+        if category_id not in self._by_id:
+            await self._arefresh(MISS_RELOAD_INTERVAL)
+        return self._by_id.get(category_id)
+
+
+registry = CategoryRegistry()
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Comment
+from .pagination import akeyset_page, keyset_page
+from .routers import primary
+
+
+def _count_key(listing_id):
+    return f"auctions:comment-count:{listing_id}"
+
+
+def _thread(listing_id):
+    # The author is joined in, so rendering a page never queries per comment
+    return (
+        Comment.objects.filter(listing_id=listing_id)
+        .select_related("author")
+        .only("message", "created_at", "author__username")
+    )
+
+
+# One page of a listing's comments, oldest first, following the ?after= cursor.
+# Walking the listing index in id order keeps every page as cheap as the first.
+def comment_page(listing_id, after=None):
+    return keyset_page(_thread(listing_id), after, settings.AUCTIONS_COMMENTS_PAGE_SIZE)
+
+
+async def acomment_page(listing_id, after=None):
+    return await akeyset_page(_thread(listing_id), after, settings.AUCTIONS_COMMENTS_PAGE_SIZE)
+
+
+# How many comments a listing has, counted once and cached until a comment is
+# added or deleted (see signals.py). Counted on the primary, as the count is cached.
+def comment_count(listing_id):
+    count = cache.get(_count_key(listing_id))
+    if count is None:
+        with primary():
+            count = Comment.objects.filter(listing_id=listing_id).count()
+        cache.set(_count_key(listing_id), count, settings.AUCTIONS_FRAGMENT_CACHE_TIMEOUT)
+    return count
+
+
+async def acomment_count(listing_id):
+    count = cache.get(_count_key(listing_id))
+    if count is None:
+        with primary():
+            count = await Comment.objects.filter(listing_id=listing_id).acount()
+        cache.set(_count_key(listing_id), count, settings.AUCTIONS_FRAGMENT_CACHE_TIMEOUT)
+    return count
+
+
+def forget_comment_counts(listing_ids):
+    cache.delete_many([_count_key(listing_id) for listing_id in listing_ids])
@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.urls import Resolver404, resolve
+
+from . import pubsub
+from .models import AuctionListing
+
+
+@sync_to_async
+def _close_connection():
+    connection.close()
+
+
+# Subscribe to a listing's price updates and read its current state.
+# Returns (subscription, state), or None when the listing does not exist.
+async def open_listing_stream(listing_id):
+    # Subscribe before reading the current state, so no bid in between is missed
+    subscription = pubsub.get_broker().subscribe(pubsub.listing_channel(listing_id))
+    state = await AuctionListing.objects.filter(pk=listing_id).values(*pubsub.LISTING_STATE_FIELDS).afirst()
+    # An idle stream has no further use for the database, so it must not hold a connection
+    await _close_connection()
+    if state is None:
+        subscription.close()
+        return None
+    return subscription, pubsub.listing_state(state)
+
+
+def _price_event(message):
+    return f"event: price\ndata: {json.dumps(message)}\n\n"
+
+
+# The server-sent events of one listing: its current state, then every change
+# until the auction closes. Streams also end after AUCTIONS_EVENTS_MAX_AGE and the
+# browser reconnects, which bounds streams whose client went away unnoticed.
+async def listing_event_stream(subscription, message):
+    loop = asyncio.get_running_loop()
+    closes_at = loop.time() + settings.AUCTIONS_EVENTS_MAX_AGE
+    try:
+        yield "retry: 3000\n\n"
+        yield _price_event(message)
+        while message["is_active"]:
+            remaining = closes_at - loop.time()
+            if remaining <= 0:
+                break
+            update = await subscription.get(timeout=min(settings.AUCTIONS_EVENTS_KEEPALIVE, remaining))
+            if update is None:
+                # A comment line keeps idle connections from being dropped by proxies
+                yield ": keep-alive\n\n"
+            else:
+                message = update
+                yield _price_event(message)
+    finally:
+        subscription.close()
+
+
+EVENT_STREAM_HEADERS = [
+    (b"content-type", b"text/event-stream"),
+    (b"cache-control", b"no-cache"),
+    # Keep proxies such as nginx from buffering the stream
+    (b"x-accel-buffering", b"no"),
+]
+
+
+class EventStreamApp:
+    """
+    ASGI app that serves listing event streams itself and everything else through Django.
+
+    Django runs each request in its own thread-sensitive context that keeps a worker
+    thread until the response is finished, so an idle stream served by the view
+    costs a thread. Served here, it costs a task, and a client that goes away is
+    noticed at once instead of at the next keep-alive.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET":
+            try:
+                match = resolve(scope["path"])
+            except Resolver404:
+                match = None
+            if match is not None and match.url_name == "listing_events":
+                return await self.serve(match.kwargs["id"], receive, send)
+        await self.application(scope, receive, send)
+
+    async def serve(self, listing_id, receive, send):
+        opened = await open_listing_stream(listing_id)
+        if opened is None:
+            await send({"type": "http.response.start", "status": 404, "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": b"Not Found"})
+            return
+
+        stream = listing_event_stream(*opened)
+
+        async def pump():
+            await send({"type": "http.response.start", "status": 200, "headers": EVENT_STREAM_HEADERS})
+            async for event in stream:
+                await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def disconnected():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        tasks = [asyncio.create_task(pump()), asyncio.create_task(disconnected())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await stream.aclose()
+        if tasks[0] in done:
+            # Surface errors raised while streaming
+            tasks[0].result()
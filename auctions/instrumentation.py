@@ -0,0 +1,207 @@
+import contextvars
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+# Per-route cost of every request: query count, database time, template render time,
+# total time and response size. RequestTimingMiddleware measures each request, sends
+# the figures back in a Server-Timing header and adds them to histograms kept in this
+# process, which the staff timings page reads.
+
+# The timings of the request being handled. Context variables follow a request into
+# the worker threads of sync_to_async, so queries run by async views are counted too.
+_current = contextvars.ContextVar("auctions_request_timings", default=None)
+
+
+class RequestTimings:
+    """What one request has spent so far."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        # Nesting depth of template renders, so only the outermost one is timed
+        self.rendering = 0
+
+
+class Histogram:
+    """
+    Log-scale histogram of non-negative values.
+
+    Each bucket covers 5% of its lower bound, so percentiles are read back within 5%
+    in constant memory however many values are recorded.
+    """
+
+    RATIO = 1.05
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        # Values under 1 (sub-millisecond times, zero queries) share the first bucket
+        bucket = 0 if value < 1 else int(math.log(value, self.RATIO)) + 1
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    # The upper bound of the bucket holding the given percentile
+    def percentile(self, percent):
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.max, 1.0 if bucket == 0 else self.RATIO ** bucket)
+        return self.max
+
+
+# Figures recorded per route, in the order the timings page lists them
+METRICS = ("total_ms", "db_ms", "template_ms", "queries", "bytes")
+
+_lock = threading.Lock()
+_routes = {}
+
+
+def record(route, **values):
+    with _lock:
+        histograms = _routes.setdefault(route, {metric: Histogram() for metric in METRICS})
+        for metric, value in values.items():
+            histograms[metric].add(value)
+
+
+# {route: {metric: {"count", "mean", "p50", "p95", "p99", "max"}}} for every route seen
+def snapshot():
+    with _lock:
+        return {
+            route: {
+                metric: {
+                    "count": histogram.count,
+                    "mean": histogram.total / histogram.count,
+                    "p50": histogram.percentile(50),
+                    "p95": histogram.percentile(95),
+                    "p99": histogram.percentile(99),
+                    "max": histogram.max,
+                }
+                for metric, histogram in histograms.items()
+            }
+            for route, histograms in sorted(_routes.items())
+        }
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+
+
+# Execute wrapper counting each query against the current request, if there is one
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - started
+        timings.queries += 1
+
+
+# Every connection, in every thread, gets the wrapper as soon as it connects
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None or timings.rendering:
+            return super().render(context, request)
+        timings.rendering += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template += time.perf_counter() - started
+            timings.rendering -= 1
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing each render for RequestTimingMiddleware.
+
+    The time includes any queries a template runs while it renders.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class RequestTimingMiddleware:
+    """Measure every request, report it in Server-Timing and add it to the route histograms."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Stay on the event loop under ASGI instead of costing async views a thread hop
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - started)
+
+    def finish(self, request, response, timings, elapsed):
+        match = request.resolver_match
+        route = match.view_name if match is not None else "<unresolved>"
+        # Streamed bodies are sent after the view returns, so their size is unknown here
+        size = 0 if response.streaming else len(response.content)
+        record(
+            route,
+            total_ms=elapsed * 1000,
+            db_ms=timings.db * 1000,
+            template_ms=timings.template * 1000,
+            queries=timings.queries,
+            bytes=size,
+        )
+        response["Server-Timing"] = ", ".join((
+            f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries"',
+            f"tpl;dur={timings.template * 1000:.1f}",
+            f"total;dur={elapsed * 1000:.1f}",
+        ))
+        return response
@@ -0,0 +1,182 @@
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from auctions.models import AuctionListing, Category, Comment, User
+from auctions.scratch import scratch_database
+
+# One server process each, with extra environment. uvicorn's own WSGI adapter mangles
+# Django's Set-Cookie headers, so the WSGI application runs under gunicorn's threaded
+# worker instead. The ASGI application runs the sync views unless AUCTIONS_ASYNC_VIEWS is set.
+SERVERS = {
+    "wsgi": ("gunicorn", ["commerce.wsgi:application", "--worker-class", "gthread", "--threads", "{threads}"], {}),
+    "asgi": ("uvicorn", ["commerce.asgi:application", "--no-access-log"], {}),
+    "async": ("uvicorn", ["commerce.asgi:application", "--no-access-log"], {"AUCTIONS_ASYNC_VIEWS": "1"}),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/sec and latency of the read-heavy pages served through the "
+        "WSGI application (sync views, gunicorn) and the ASGI application (uvicorn), "
+        "with its default sync views and with AUCTIONS_ASYNC_VIEWS. Runs against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=3_000, help="Requests per interface.")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--listings", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=8, help="Threads of the WSGI worker.")
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        for server in ("uvicorn", "gunicorn"):
+            if find_spec(server) is None:
+                raise CommandError(f"bench_asgi needs {server}: pip install {server}")
+
+        with scratch_database("asgi"):
+            owner = User.objects.create(username="bench-asgi-owner")
+            viewer = User.objects.create(username="bench-asgi-viewer")
+            category = Category.objects.create(category_name="bench-asgi")
+            listing_ids = self.seed(owner, viewer, category, options["listings"])
+            # A signed-in session, so pages render the member layout and the watchlist
+            client = Client()
+            client.force_login(viewer)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+
+            # The servers share this process's scratch database and caches, where the
+            # session above was saved
+            scratch = {
+                "AUCTIONS_DATABASE": connection.settings_dict["NAME"],
+                "AUCTIONS_CACHE_DIR": settings.CACHES["default"]["LOCATION"],
+                "AUCTIONS_SESSION_CACHE_DIR": settings.CACHES["sessions"]["LOCATION"],
+            }
+            paths = [reverse("index"), reverse("display"), reverse("watchlist"), reverse("closed_auctions")]
+            paths.append(reverse("category", args=(category.pk,)))
+            paths += [reverse("listing", args=(listing_id,)) for listing_id in listing_ids]
+            results = {}
+            for name, (server, arguments, environment) in SERVERS.items():
+                arguments = [argument.format(threads=options["threads"]) for argument in arguments]
+                environment = {**scratch, **environment}
+                results[name] = self.run_server(server, arguments, environment, paths, session, options)
+
+        self.stdout.write(f"{'':6}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for name, (rate, latencies, errors) in results.items():
+            self.stdout.write(
+                f"{name:6}{rate:9.0f}{percentile(latencies, 50):9.1f}{percentile(latencies, 99):9.1f}{errors:8}"
+            )
+
+    def seed(self, owner, viewer, category, count):
+        listings = AuctionListing.objects.bulk_create(
+            AuctionListing(
+                title=f"bench-{index}",
+                description="A listing for the ASGI benchmark",
+                image_url="https://example.com/bench.png",
+                owner=owner,
+                category=category,
+                current_price=10,
+                # Every tenth listing is closed so the closed grid has cards too
+                is_active=index % 10 != 0,
+            )
+            for index in range(count)
+        )
+        Comment.objects.bulk_create(
+            Comment(author=viewer, listing=listing, message=f"Comment {index}")
+            for listing in listings
+            for index in range(5)
+        )
+        viewer.listing_watchlist.add(*(listing for listing in listings[::4] if listing.is_active))
+        return [listing.pk for listing in listings]
+
+    def run_server(self, server, arguments, environment, paths, session, options):
+        port = options["port"]
+        bind = ["--bind", f"127.0.0.1:{port}"] if server == "gunicorn" else ["--port", str(port)]
+        server = subprocess.Popen(
+            [sys.executable, "-m", server, *arguments, *bind, "--workers", "1", "--log-level", "warning"],
+            env={**os.environ, **environment},
+        )
+        try:
+            wait_for_port(port)
+            # Warm the fragment cache and the category registry before measuring
+            asyncio.run(drive(port, paths, session, len(paths), options["concurrency"]))
+            started = time.perf_counter()
+            latencies, errors = asyncio.run(drive(port, paths, session, options["requests"], options["concurrency"]))
+            elapsed = time.perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait()
+        return len(latencies) / elapsed, latencies, errors
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, len(ordered) * percent // 100)] * 1000
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f"The server did not start listening on port {port}.")
+
+
+# Send `total` GET requests over `concurrency` keep-alive connections, picking
+# paths at random. Returns the latency of each successful request and the error count.
+async def drive(port, paths, session, total, concurrency):
+    remaining = total
+    latencies, errors = [], 0
+
+    async def connection():
+        nonlocal remaining, errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            while remaining > 0:
+                remaining -= 1
+                path = random.choice(paths)
+                started = time.perf_counter()
+                writer.write(
+                    f"GET {path} HTTP/1.1\r\nHost: localhost\r\n"
+                    f"Cookie: {settings.SESSION_COOKIE_NAME}={session}\r\n\r\n".encode()
+                )
+                await writer.drain()
+                status = await read_response(reader)
+                if status == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(connection() for _ in range(concurrency)))
+    return latencies, errors
+
+
+# Read one HTTP/1.1 response and return its status code
+async def read_response(reader):
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while size := int(await reader.readline(), 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    return status
@@ -0,0 +1,94 @@
+import itertools
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from auctions.models import AuctionListing, Bid, User
+from auctions.scratch import scratch_database
+from auctions.services import BidRejected, place_bid
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a single listing with concurrent bids from many threads and check "
+        "that no accepted bid is lost or applied out of order. Runs against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--bids-per-thread", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with scratch_database("bids"):
+            self.race(options["threads"], options["bids_per_thread"])
+
+    def race(self, threads, bids_per_thread):
+        bidder = User.objects.create(username="bench-bidder")
+        listing = AuctionListing.objects.create(
+            title="bench-hot-listing",
+            description="Benchmark listing",
+            image_url="https://example.com/bench.png",
+            current_price=1,
+            owner=bidder,
+        )
+
+        # Amounts are handed out in increasing order, but threads race to commit
+        # them, so many bids arrive after a higher one and must be rejected
+        amounts = itertools.count(2)
+        amounts_lock = threading.Lock()
+        accepted, rejected, errors = [], [], []
+        results_lock = threading.Lock()
+
+        def worker():
+            try:
+                for _ in range(bids_per_thread):
+                    with amounts_lock:
+                        amount = next(amounts)
+                    try:
+                        bid = place_bid(listing.pk, bidder, amount)
+                    except BidRejected:
+                        with results_lock:
+                            rejected.append(amount)
+                    except OperationalError as error:
+                        with results_lock:
+                            errors.append(str(error))
+                    else:
+                        with results_lock:
+                            accepted.append((bid.pk, amount))
+            finally:
+                connection.close()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        listing.refresh_from_db()
+        # The ledger in insertion order is the order bids were accepted in
+        ledger = list(Bid.objects.filter(listing=listing).order_by("pk").values_list("bid", flat=True))
+        highest = max((amount for _, amount in accepted), default=1)
+
+        attempts = threads * bids_per_thread
+        self.stdout.write(
+            f"{attempts} bids in {elapsed:.2f}s ({attempts / elapsed:.0f} bids/s): "
+            f"{len(accepted)} accepted, {len(rejected)} rejected, {len(errors)} errors"
+        )
+
+        # Every accepted bid must be in the ledger, each one higher than the last,
+        # and the listing must end on the highest of them
+        if sorted(ledger) != sorted(amount for _, amount in accepted):
+            raise CommandError(f"The ledger holds {len(ledger)} bids but {len(accepted)} were accepted.")
+        if any(later <= earlier for earlier, later in zip(ledger, ledger[1:])):
+            raise CommandError("The ledger accepted a bid that was not higher than the one before it.")
+        if listing.bid_count != len(accepted):
+            raise CommandError(f"Listing counted {listing.bid_count} bids but {len(accepted)} were accepted.")
+        if listing.current_price != highest:
+            raise CommandError(
+                f"Listing ended at {listing.current_price} but the highest accepted bid was {highest}."
+            )
+        self.stdout.write(self.style.SUCCESS(f"OK: listing ended on the highest accepted bid ({highest})."))
@@ -0,0 +1,77 @@
+import gc
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from auctions import synthetic
+from auctions.models import AuctionListing
+from auctions.pagination import KeysetPage
+from auctions.scratch import scratch_database
+
+# The two ways of loading a grid: model instances limited to the card columns, and
+# ListingCard objects read straight from the same columns
+LOADERS = {
+    "models": lambda: AuctionListing.objects.for_cards("description"),
+    "cards": lambda: AuctionListing.objects.cards("description"),
+}
+TEMPLATES = {"index grid": "auctions/index_grid.html", "closed grid": "auctions/closed_grid.html"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load and render a grid of --cards listings as model instances and as ListingCard objects, "
+        "reporting the memory the loaded rows hold and the median time to load and to render them. "
+        "Runs against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cards", type=int, default=10_000)
+        parser.add_argument("--repeats", type=int, default=5, help="Timed runs of each step; the median is shown.")
+
+    def handle(self, *args, **options):
+        with scratch_database("cards"):
+            synthetic.seed(options["cards"])
+            results = {name: self.measure(loader, options) for name, loader in LOADERS.items()}
+
+        self.stdout.write(f"{options['cards']} listings, median of {options['repeats']} runs:")
+        self.stdout.write(
+            f"{'':8}{'memory':>10}{'per row':>9}{'load':>10}" + "".join(f"{label:>13}" for label in TEMPLATES)
+        )
+        for name, figures in results.items():
+            self.stdout.write(
+                f"{name:8}{figures['memory'] / 2**20:8.2f}MB{figures['memory'] / options['cards']:7.0f} B"
+                f"{figures['load']:8.1f}ms" + "".join(f"{figures[label]:11.1f}ms" for label in TEMPLATES)
+            )
+
+    def measure(self, loader, options):
+        def load():
+            return list(loader().order_by("id")[:options["cards"]])
+
+        # Memory held by the loaded rows, once the query's own buffers are freed
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        items = load()
+        gc.collect()
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        figures = {"memory": memory, "load": self.median(load, options["repeats"])}
+        page = KeysetPage(items, None)
+        for label, template in TEMPLATES.items():
+            figures[label] = self.median(
+                lambda: render_to_string(template, {"listings": page, "closed_listings": page}), options["repeats"]
+            )
+        return figures
+
+    def median(self, step, repeats):
+        timings = []
+        for _ in range(repeats):
+            gc.collect()
+            started = time.perf_counter()
+            step()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
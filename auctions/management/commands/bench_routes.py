@@ -0,0 +1,281 @@
+import itertools
+import json
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from auctions import instrumentation, synthetic, urls
+from auctions.models import AuctionListing, Category, User
+from auctions.scratch import scratch_database
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+PASSWORD = "bench-password"
+# Requests each route gets before the next route takes its turn
+ROUND_SIZE = 10
+
+# Every route in auctions/urls.py, in the order they are driven: reads first, then
+# writes. Each entry is (url name, method, client, request), where request(data, n)
+# returns the path and body of the n-th request. Routes answering more than one
+# method appear once per method. Clients are "member" (a signed-in staff user),
+# "guest" (a separate session that logs in and out) and "anonymous".
+ROUTES = [
+    ("index", "get", "member", lambda data, n: (reverse("index"), None)),
+    ("display", "get", "member", lambda data, n: (reverse("display"), None)),
+    ("category", "get", "member", lambda data, n: (reverse("category", args=(data.category(n),)), None)),
+    ("search", "get", "member", lambda data, n: (reverse("search"), {"q": data.word(n)})),
+    ("listing", "get", "member", lambda data, n: (reverse("listing", args=(data.listing(n),)), None)),
+    (
+        "listing_comments",
+        "get",
+        "member",
+        lambda data, n: (reverse("listing_comments", args=(data.listing(n),)), {"after": 0}),
+    ),
+    ("listing_events", "get", "member", lambda data, n: (reverse("listing_events", args=(data.listing(n),)), None)),
+    ("watchlist", "get", "member", lambda data, n: (reverse("watchlist"), None)),
+    ("closed_auctions", "get", "member", lambda data, n: (reverse("closed_auctions"), None)),
+    ("closed_auctions_export", "get", "member", lambda data, n: (reverse("closed_auctions_export"), None)),
+    ("route_timings", "get", "member", lambda data, n: (reverse("route_timings"), None)),
+    ("cache_stats", "get", "member", lambda data, n: (reverse("cache_stats"), None)),
+    ("api_listings", "get", "member", lambda data, n: (reverse("api_listings"), None)),
+    ("api_listing", "get", "member", lambda data, n: (reverse("api_listing", args=(data.listing(n),)), None)),
+    ("api_comments", "get", "member", lambda data, n: (reverse("api_comments", args=(data.listing(n),)), None)),
+    (
+        "add_bid",
+        "post",
+        "member",
+        lambda data, n: (reverse("add_bid", args=(data.listing(n),)), {"starting_bid": data.next_amount()}),
+    ),
+    (
+        "api_bids",
+        "post",
+        "member",
+        lambda data, n: (reverse("api_bids", args=(data.listing(n),)), {"amount": data.next_amount()}),
+    ),
+    (
+        "add_comment",
+        "post",
+        "member",
+        lambda data, n: (reverse("add_comment", args=(data.listing(n),)), {"new_comment": "Still available?"}),
+    ),
+    (
+        "api_comments",
+        "post",
+        "member",
+        lambda data, n: (reverse("api_comments", args=(data.listing(n),)), {"message": "Still available?"}),
+    ),
+    ("add_watchlist", "post", "member", lambda data, n: (reverse("add_watchlist", args=(data.listing(n),)), None)),
+    ("remove_watchlist", "post", "member", lambda data, n: (reverse("remove_watchlist", args=(data.listing(n),)), None)),
+    ("api_watch", "post", "member", lambda data, n: (reverse("api_watch", args=(data.listing(n),)), None)),
+    ("api_watch", "delete", "member", lambda data, n: (reverse("api_watch", args=(data.listing(n),)), None)),
+    (
+        "create_listing",
+        "post",
+        "member",
+        lambda data, n: (reverse("create_listing"), {
+            "title": f"Bench listing {n}",
+            "description": "Created by the route benchmark",
+            "image_url": "https://example.com/bench.png",
+            "starting_bid": 10,
+            "category": data.category(n),
+        }),
+    ),
+    ("close_auction", "post", "member", lambda data, n: (reverse("close_auction", args=(data.own_listing(n),)), None)),
+    ("register", "post", "anonymous", lambda data, n: (reverse("register"), {
+        "username": f"bench-register-{n}",
+        "email": f"bench-register-{n}@example.com",
+        "password": PASSWORD,
+        "confirmation": PASSWORD,
+    })),
+    ("login", "post", "guest", lambda data, n: (reverse("login"), {"username": "bench-member", "password": PASSWORD})),
+    ("logout", "get", "guest", lambda data, n: (reverse("logout"), None)),
+]
+
+
+class BenchData:
+    """The ids the routes pick from, cycled so each request of a route gets a different one."""
+
+    def __init__(self, listing_ids, category_ids, own_listing_ids, highest_price):
+        self.listing_ids = listing_ids
+        self.category_ids = category_ids
+        self.own_listing_ids = own_listing_ids
+        # Above every current price, and rising, so every bid is accepted
+        self.amount = highest_price
+
+    def listing(self, n):
+        return self.listing_ids[n % len(self.listing_ids)]
+
+    def category(self, n):
+        return self.category_ids[n % len(self.category_ids)]
+
+    def word(self, n):
+        return synthetic.WORDS[n % len(synthetic.WORDS)]
+
+    def own_listing(self, n):
+        return self.own_listing_ids[n]
+
+    def next_amount(self):
+        self.amount += 1
+        return self.amount
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic catalogue at 10k, 100k or 1M listings into a scratch database and drive every "
+        "route in auctions/urls.py through the test client. Reports throughput, latency percentiles and "
+        "query counts per route as JSON, and with --baseline fails on regressions against stored results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=SCALES, default="10k", help="Number of synthetic listings.")
+        parser.add_argument("--requests", type=int, default=50, help="Measured requests per route.")
+        parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per route first.")
+        parser.add_argument("--output", help="Write the results to this JSON file as well as printing them.")
+        parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.5, help="Allowed p50 slowdown against the baseline (0.5 = 50%%)."
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the scratch database, and reuse a kept one instead of seeding it again.",
+        )
+
+    def handle(self, *args, **options):
+        missing = {pattern.name for pattern in urls.urlpatterns} - {name for name, _, _, _ in ROUTES}
+        if missing:
+            raise CommandError(f"The benchmark does not drive these routes yet: {', '.join(sorted(missing))}")
+
+        with scratch_database(options["scale"], keepdb=options["keepdb"]):
+            seeded = self.seed(SCALES[options["scale"]])
+            routes = self.drive(options)
+
+        results = {
+            "scale": options["scale"],
+            "seeded": seeded,
+            "requests_per_route": options["requests"],
+            "routes": routes,
+        }
+        report = json.dumps(results, indent=2)
+        self.stdout.write(report)
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                output.write(report + "\n")
+        if options["baseline"]:
+            self.compare(results, options["baseline"], options["tolerance"])
+
+    def seed(self, listings):
+        if Category.objects.filter(category_name="Synthetic 0").exists():
+            # A database kept from an earlier run
+            return {
+                "users": User.objects.count(),
+                "categories": Category.objects.count(),
+                "listings": AuctionListing.objects.count(),
+            }
+        started = time.perf_counter()
+        counts = synthetic.seed(listings)
+        self.stderr.write(f"Seeded {counts} in {time.perf_counter() - started:.1f}s")
+        return counts
+
+    def drive(self, options):
+        total = options["warmup"] + options["requests"]
+        member = User.objects.create_user("bench-member", password=PASSWORD, is_staff=True)
+        own_listings = AuctionListing.objects.bulk_create(
+            AuctionListing(title=f"Bench own {n}", image_url="https://example.com/bench.png", owner=member)
+            for n in range(total)
+        )
+        # Listings spread evenly over the catalogue, the same ones on every run
+        active = AuctionListing.objects.active().exclude(owner=member).order_by("id").values_list("id", flat=True)
+        stride = max(1, active.count() // total)
+        active_ids = list(itertools.islice(active.iterator(), 0, stride * total, stride))
+        data = BenchData(
+            active_ids,
+            list(Category.objects.values_list("id", flat=True)),
+            [listing.pk for listing in own_listings],
+            AuctionListing.objects.aggregate(highest=Max("current_price"))["highest"],
+        )
+        clients = {name: Client(SERVER_NAME="localhost") for name in ("member", "guest", "anonymous")}
+        clients["member"].force_login(member)
+        cache.clear()
+        instrumentation.reset()
+
+        # Routes take turns a few requests at a time, so a slow spell on the machine
+        # is spread over all of them instead of landing on whichever route is running
+        samples = {}
+        for name, method, _, _ in ROUTES:
+            samples[f"{name}:{method}" if name in samples else name] = {"latencies": [], "queries": [], "errors": 0}
+        rounds = [range(start, min(start + ROUND_SIZE, total)) for start in range(0, total, ROUND_SIZE)]
+        try:
+            for requests in rounds:
+                for (_, method, client, request), figures in zip(ROUTES, samples.values()):
+                    for n in requests:
+                        self.measure(clients[client], method, request(data, n), n >= options["warmup"], figures)
+        finally:
+            # Leave a kept database ready for the next run; the member's listings go with it
+            User.objects.filter(username__startswith="bench-").delete()
+        return {key: summarize(figures) for key, figures in samples.items()}
+
+    def measure(self, client, method, request, record, figures):
+        path, body = request
+        send = getattr(client, method)
+        # With DEBUG on, the query log stops growing at 9000 entries, after which
+        # CaptureQueriesContext would count nothing; seeding alone fills it
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = send(path, body) if body is not None else send(path)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            elapsed = time.perf_counter() - started
+        if record:
+            figures["latencies"].append(elapsed)
+            figures["queries"].append(len(captured))
+            figures["errors"] += response.status_code >= 400
+
+    # A route regresses when a request issues more queries than any did in the
+    # baseline (the mean depends on how many requests hit the cache), or when its
+    # median is both `tolerance` and a millisecond slower. The tail percentiles of a
+    # few dozen requests move too much between runs to gate on.
+    def compare(self, results, path, tolerance):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["scale"] != results["scale"]:
+            raise CommandError(f"{path} was recorded at the {baseline['scale']} scale, not {results['scale']}.")
+        regressions = []
+        for key, figures in results["routes"].items():
+            before = baseline["routes"].get(key)
+            if before is None:
+                continue
+            if figures["queries_max"] > before["queries_max"]:
+                regressions.append(f"{key}: {before['queries_max']} -> {figures['queries_max']} queries")
+            if figures["p50_ms"] > max(before["p50_ms"] * (1 + tolerance), before["p50_ms"] + 1):
+                regressions.append(f"{key}: p50 {before['p50_ms']} -> {figures['p50_ms']} ms")
+        if regressions:
+            raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+        self.stderr.write(self.style.SUCCESS(f"No regressions against {path}."))
+
+
+def summarize(figures):
+    latencies, queries = figures["latencies"], figures["queries"]
+    elapsed = sum(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": figures["errors"],
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "queries_mean": round(sum(queries) / len(queries), 2),
+        "queries_max": max(queries),
+    }
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, len(ordered) * percent // 100)] * 1000, 2)
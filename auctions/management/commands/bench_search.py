@@ -0,0 +1,88 @@
+import itertools
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from auctions.models import AuctionListing
+from auctions.scratch import scratch_database
+from auctions.search import search_listings
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "ze", "po", "qua", "bri", "dor", "fen", "gal"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark FTS5 listing search against icontains scans on a synthetic catalogue, "
+        "seeded into a scratch database. --keepdb keeps the catalogue for the next run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=1_000_000, help="Number of synthetic listings.")
+        parser.add_argument("--queries", type=int, default=20, help="Number of distinct search terms to time.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--keepdb", action="store_true", help="Keep the seeded database and reuse it on the next run."
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The FTS5 search index only exists on SQLite.")
+
+        rng = random.Random(options["seed"])
+        # A Zipf-like vocabulary: a few words are everywhere, most are rare
+        vocabulary = sorted({
+            "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(20_000)
+        })
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+        cumulative = list(itertools.accumulate(weights))
+
+        def text(words):
+            return " ".join(rng.choices(vocabulary, cum_weights=cumulative, k=words))
+
+        # Each size and seed gets a database of its own, so a kept one always holds the same catalogue
+        with scratch_database(f"search-{options['size']}-{options['seed']}", keepdb=options["keepdb"]):
+            if AuctionListing.objects.exists():
+                self.stdout.write(f"Reusing the kept catalogue of {options['size']} listings")
+            else:
+                started = time.perf_counter()
+                batch = []
+                for index in range(options["size"]):
+                    batch.append(AuctionListing(
+                        title=text(4)[:225],
+                        description=text(20)[:225],
+                        image_url="https://example.com/image.png",
+                        is_active=index % 5 != 0,
+                    ))
+                    if len(batch) == 10_000:
+                        AuctionListing.objects.bulk_create(batch)
+                        batch = []
+                AuctionListing.objects.bulk_create(batch)
+                self.stdout.write(f"Seeded {options['size']} listings in {time.perf_counter() - started:.1f}s")
+
+            # Sample terms across the frequency range, from common to rare
+            step = max(1, len(vocabulary) // options["queries"])
+            terms = [vocabulary[rank] for rank in sorted(range(len(vocabulary)), key=lambda r: -weights[r])[::step]]
+
+            fts_times, scan_times = [], []
+            for term in terms[:options["queries"]]:
+                started = time.perf_counter()
+                search_listings(term)
+                fts_times.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                list(
+                    AuctionListing.objects.for_cards().active()
+                    .filter(Q(title__icontains=term) | Q(description__icontains=term))
+                    .order_by("-id")[:24]
+                )
+                scan_times.append(time.perf_counter() - started)
+
+        fts, scan = statistics.median(fts_times), statistics.median(scan_times)
+        self.stdout.write(
+            f"median over {len(fts_times)} terms: FTS5 {fts * 1000:.2f} ms, "
+            f"icontains {scan * 1000:.2f} ms ({scan / fts:.0f}x faster)"
+        )
@@ -0,0 +1,83 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from auctions import synthetic
+from auctions.models import AuctionListing, User
+from auctions.scratch import scratch_database
+
+# Django's defaults: sessions in the database and messages in a cookie that spills
+# over into the session
+STOCK_PROFILE = {
+    "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+    "MESSAGE_STORAGE": "django.contrib.messages.storage.fallback.FallbackStorage",
+}
+WRITES = ("INSERT", "UPDATE", "DELETE")
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the database reads and writes of a signed-in bid-and-redirect cycle (POST add_bid, then "
+        "GET the listing it redirects to), with stock session and message storage and then with the "
+        "configuration in settings.py. Runs against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cycles", type=int, default=200)
+        parser.add_argument("--listings", type=int, default=1000, help="Size of the synthetic catalogue.")
+
+    def handle(self, *args, **options):
+        with scratch_database("sessions"):
+            synthetic.seed(options["listings"])
+            configured = {"SESSION_ENGINE": settings.SESSION_ENGINE, "MESSAGE_STORAGE": settings.MESSAGE_STORAGE}
+            results = [
+                (name, self.run(profile, options["cycles"]))
+                for name, profile in (("stock", STOCK_PROFILE), ("tuned", configured))
+            ]
+
+        self.stdout.write("Per bid-and-redirect cycle:")
+        self.stdout.write(
+            f"{'':7}{'queries':>9}{'session reads':>15}{'session writes':>16}{'other writes':>14}{'time':>10}"
+        )
+        for name, figures in results:
+            self.stdout.write(
+                f"{name:7}{figures['queries']:9.2f}{figures['session_reads']:15.2f}"
+                f"{figures['session_writes']:16.2f}{figures['other_writes']:14.2f}{figures['ms']:8.2f}ms"
+            )
+
+    def run(self, profile, cycles):
+        with override_settings(**profile):
+            bidder = User.objects.create_user(f"bench-sessions-{profile['SESSION_ENGINE']}")
+            listing = AuctionListing.objects.active().filter(ends_at__isnull=True).order_by("id").first()
+            amount = AuctionListing.objects.get(pk=listing.pk).current_price
+            # A new client loads the middleware, and with it the session engine, afresh
+            client = Client(SERVER_NAME="localhost")
+            client.force_login(bidder)
+            url = reverse("add_bid", args=(listing.pk,))
+
+            totals = dict.fromkeys(("queries", "session_reads", "session_writes", "other_writes"), 0)
+            elapsed = 0.0
+            for _ in range(cycles):
+                amount += 1
+                reset_queries()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.post(url, {"starting_bid": amount})
+                    client.get(response.url)
+                    elapsed += time.perf_counter() - started
+                for query in captured:
+                    sql = query["sql"]
+                    is_write = sql.startswith(WRITES)
+                    totals["queries"] += 1
+                    if "django_session" in sql:
+                        totals["session_writes" if is_write else "session_reads"] += 1
+                    elif is_write:
+                        totals["other_writes"] += 1
+        figures = {key: value / cycles for key, value in totals.items()}
+        figures["ms"] = elapsed / cycles * 1000
+        return figures
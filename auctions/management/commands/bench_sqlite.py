@@ -0,0 +1,153 @@
+import itertools
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from auctions import synthetic
+from auctions.models import AuctionListing, User
+from auctions.scratch import scratch_database
+
+from .bench_routes import percentile
+
+# SQLite as Django configures it out of the box: rollback journal, full syncs, a
+# new connection per request and Python's 5 second busy timeout
+STOCK_PROFILE = {
+    "pragmas": {"journal_mode": "delete", "synchronous": "full"},
+    "CONN_MAX_AGE": 0,
+    "timeout": 5,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure listing page reads while other processes place bids through add_bid, first with stock SQLite "
+        "settings and then with the profile in settings.py (WAL, synchronous=NORMAL, mmap, cache size, "
+        "busy timeout and persistent connections). Runs against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=10, help="Duration of each run.")
+        parser.add_argument("--listings", type=int, default=10_000, help="Size of the synthetic catalogue.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("bench_sqlite compares SQLite settings.")
+
+        with scratch_database("sqlite"):
+            synthetic.seed(options["listings"])
+            tuned = {
+                "pragmas": settings.AUCTIONS_SQLITE_PRAGMAS,
+                "CONN_MAX_AGE": settings.DATABASES["default"]["CONN_MAX_AGE"],
+                "timeout": settings.DATABASES["default"]["OPTIONS"].get("timeout", 5),
+            }
+            results = [
+                (name, self.run(profile, options)) for name, profile in (("stock", STOCK_PROFILE), ("tuned", tuned))
+            ]
+
+        self.stdout.write(
+            f"{'':7}{'reads/s':>9}{'read p50':>10}{'read p99':>10}{'read max':>10}{'bids/s':>8}{'locked':>8}"
+        )
+        for name, (reads, read_rate, bid_rate, locked) in results:
+            self.stdout.write(
+                f"{name:7}{read_rate:9.0f}{percentile(reads, 50):8.1f}ms{percentile(reads, 99):8.1f}ms"
+                f"{max(reads) * 1000:8.1f}ms{bid_rate:8.0f}{locked:8}"
+            )
+
+    # Run readers and bid writers together for the configured time under one profile
+    def run(self, profile, options):
+        database = connection.settings_dict
+        saved = (database["CONN_MAX_AGE"], dict(database["OPTIONS"]))
+        database["CONN_MAX_AGE"] = profile["CONN_MAX_AGE"]
+        database["OPTIONS"]["timeout"] = profile["timeout"]
+        # New connections pick up the profile; the journal mode is a property of the
+        # file, so the stock run switches it back explicitly
+        connection.close()
+        try:
+            with override_settings(AUCTIONS_SQLITE_PRAGMAS=profile["pragmas"]):
+                return self.race(options)
+        finally:
+            connection.close()
+            database["CONN_MAX_AGE"], database["OPTIONS"] = saved
+
+    # Readers and writers are separate processes, as under a multi-process server, so
+    # they contend for SQLite's locks rather than for the interpreter lock
+    def race(self, options):
+        bidder, _ = User.objects.get_or_create(username="bench-sqlite-bidder")
+        hot = AuctionListing.objects.active().order_by("id").first()
+        listing_ids = list(AuctionListing.objects.active().order_by("id").values_list("id", flat=True)[:500])
+        listing_ids.append(hot.pk)
+        # Each writer bids in its own lane of amounts, all above the current price
+        start = AuctionListing.objects.get(pk=hot.pk).current_price + 1
+        connection.close()
+
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        deadline = time.time() + options["seconds"]
+        workers = [
+            context.Process(target=read_pages, args=(results, bidder.pk, listing_ids, index * 37, deadline))
+            for index in range(options["readers"])
+        ]
+        workers += [
+            context.Process(
+                target=place_bids, args=(results, bidder.pk, hot.pk, start + index, options["writers"], deadline)
+            )
+            for index in range(options["writers"])
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        outcomes = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        reads = [latency for kind, samples, _ in outcomes if kind == "read" for latency in samples]
+        bids = sum(count for kind, count, _ in outcomes if kind == "bid")
+        locked = sum(errors for _, _, errors in outcomes)
+        return reads, len(reads) / elapsed, bids / elapsed, locked
+
+
+def _client(user_id):
+    client = Client(SERVER_NAME="localhost")
+    client.force_login(User.objects.get(pk=user_id))
+    return client
+
+
+def read_pages(results, user_id, listing_ids, offset, deadline):
+    client = _client(user_id)
+    latencies, locked = [], 0
+    for listing_id in itertools.islice(itertools.cycle(listing_ids), offset, None):
+        if time.time() >= deadline:
+            break
+        started = time.perf_counter()
+        try:
+            client.get(reverse("listing", args=(listing_id,)))
+        except OperationalError:
+            locked += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    results.put(("read", latencies, locked))
+
+
+def place_bids(results, user_id, listing_id, first_amount, step, deadline):
+    client = _client(user_id)
+    placed, locked = 0, 0
+    for amount in itertools.count(first_amount, step):
+        if time.time() >= deadline:
+            break
+        try:
+            client.post(reverse("add_bid", args=(listing_id,)), {"starting_bid": amount})
+        except OperationalError:
+            locked += 1
+            continue
+        placed += 1
+    connection.close()
+    results.put(("bid", placed, locked))
@@ -0,0 +1,114 @@
+import asyncio
+import resource
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+
+from auctions.models import AuctionListing, User
+from auctions.scratch import scratch_database
+from auctions.services import place_bid
+
+
+def close_connection():
+    connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test for live price updates: hold many idle event streams open on one "
+        "in-process ASGI worker, then time how long a single bid takes to reach all of them. "
+        "Runs against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=5_000)
+        parser.add_argument("--max-seconds", type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        with scratch_database("sse"):
+            owner = User.objects.create(username="sse-owner")
+            bidder = User.objects.create(username="sse-bidder")
+            listing = AuctionListing.objects.create(
+                title="sse load test", image_url="https://example.com/sse.png", owner=owner, current_price=1
+            )
+            asyncio.run(self.run(listing, bidder, options))
+
+    async def run(self, listing, bidder, options):
+        from commerce.asgi import application
+
+        count = options["subscribers"]
+        path = reverse("listing_events", args=(listing.pk,))
+        # Every stream reports the events it receives; the first is the current price
+        events = [asyncio.Queue() for _ in range(count)]
+
+        async def subscriber(queue):
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": b"",
+                "headers": [(b"host", b"localhost"), (b"accept", b"text/event-stream")],
+                "client": ("127.0.0.1", 0),
+                "server": ("localhost", 80),
+            }
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # An idle client never sends anything else
+                await asyncio.Future()
+
+            async def send(message):
+                if message["type"] == "http.response.body" and b"event: price" in message.get("body", b""):
+                    queue.put_nowait(time.perf_counter())
+
+            await application(scope, receive, send)
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(subscriber(queue)) for queue in events]
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.get() for queue in events)), options["max_seconds"])
+            connected = time.perf_counter() - started
+            rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+            self.stdout.write(
+                f"Opened {count} event streams in {connected:.1f}s, "
+                f"peak RSS grew by {rss_growth:.0f} MiB ({rss_growth * 1024 / count:.1f} KiB per stream)"
+            )
+
+            # Hold the streams idle for a moment, then bid once and wait for the fan-out
+            await asyncio.sleep(1)
+            published = time.perf_counter()
+            await sync_to_async(place_bid)(listing.pk, bidder, 2)
+            arrivals = await asyncio.wait_for(
+                asyncio.gather(*(queue.get() for queue in events)), options["max_seconds"]
+            )
+            latencies = sorted(arrival - published for arrival in arrivals)
+            self.stdout.write(
+                f"One bid reached {len(latencies)} streams: "
+                f"p50 {latencies[len(latencies) // 2] * 1000:.0f}ms, "
+                f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f}ms, "
+                f"last {latencies[-1] * 1000:.0f}ms"
+            )
+            failed = [task for task in tasks if task.done()]
+            if failed:
+                raise CommandError(f"{len(failed)} event streams ended early.")
+            self.stdout.write(self.style.SUCCESS(f"OK: {count} idle subscribers held on one worker."))
+        except asyncio.TimeoutError:
+            raise CommandError(f"Event streams did not all respond within {options['max_seconds']}s.")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Close the connection of the thread the requests ran their queries in
+            await sync_to_async(close_connection)()
@@ -0,0 +1,73 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from auctions import watchlist
+from auctions.models import AuctionListing, User
+from auctions.scratch import scratch_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark watchlist membership, watcher counts and watched ids on a listing with "
+        "many watchers. Runs against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--watchers", type=int, default=100_000, help="Watchers of the benchmark listing.")
+        parser.add_argument("--watched", type=int, default=500, help="Other listings the measured user watches.")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database("watchlist"):
+            started = time.perf_counter()
+            users = User.objects.bulk_create(
+                (User(username=f"bench-watcher-{index}", password="!") for index in range(options["watchers"])),
+                batch_size=10_000,
+            )
+            listing = AuctionListing.objects.create(title="bench watchlist", image_url="https://example.com/w.png")
+            others = AuctionListing.objects.bulk_create(
+                AuctionListing(title=f"bench watched {index}", image_url="https://example.com/w.png")
+                for index in range(options["watched"])
+            )
+            watchlist.Watch.objects.bulk_create(
+                (watchlist.Watch(auctionlisting_id=listing.pk, user_id=user.pk) for user in users),
+                batch_size=10_000,
+            )
+            # The user measured is the newest watcher, the last row a full load would reach
+            user = users[-1]
+            watchlist.Watch.objects.bulk_create(
+                watchlist.Watch(auctionlisting_id=other.pk, user_id=user.pk) for other in others
+            )
+            watchlist.recount_watchers([listing.pk, *(other.pk for other in others)])
+            self.stdout.write(f"Seeded {options['watchers']} watchers in {time.perf_counter() - started:.1f}s")
+
+            def cold_watched_ids():
+                watchlist.forget_watched([user.pk])
+                return watchlist.watched_ids(user)
+
+            timings = [
+                ("membership: user in watchlist.all()", lambda: user in listing.watchlist.all()),
+                ("membership: EXISTS", lambda: watchlist.is_watching(user, listing.pk)),
+                ("watchers: watchlist.count()", lambda: listing.watchlist.count()),
+                (
+                    "watchers: stored watcher_count",
+                    lambda: AuctionListing.objects.values_list("watcher_count", flat=True).get(pk=listing.pk),
+                ),
+                (f"watched ids ({options['watched'] + 1}), uncached", cold_watched_ids),
+                (f"watched ids ({options['watched'] + 1}), cached", lambda: watchlist.watched_ids(user)),
+            ]
+            results = []
+            for name, run in timings:
+                run()
+                samples = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    run()
+                    samples.append(time.perf_counter() - started)
+                results.append((name, statistics.median(samples)))
+
+        self.stdout.write(f"median of {options['repeat']} runs:")
+        for name, seconds in results:
+            self.stdout.write(f"  {name:40} {seconds * 1000:10.3f} ms")
@@ -0,0 +1,28 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions import caching
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the listing fragment cache hit and miss counters. Needs a cache shared with the "
+        "server, such as FileBasedCache; with the in-process cache, see the staff page at /cache/stats."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Reset the counters after printing them.")
+
+    def handle(self, *args, **options):
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+            raise CommandError(
+                "The default cache lives in each server process, so this command would only see its own "
+                "empty counters. Read them at /cache/stats instead, or configure a shared cache."
+            )
+        stats = caching.get_stats()
+        lookups = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / lookups if lookups else 0
+        self.stdout.write(f"hits: {stats['hits']}  misses: {stats['misses']}  hit ratio: {ratio:.1%}")
+        if options["reset"]:
+            caching.reset_stats()
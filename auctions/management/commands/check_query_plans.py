@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from auctions import query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN QUERY PLAN for every registered hot query and fail if any of them "
+        "falls back to a full table scan."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Query plans can only be checked on SQLite.")
+
+        failures = []
+        for name in query_plans.HOT_QUERIES:
+            plan = query_plans.explain(name)
+            scans = query_plans.full_scans(plan)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: full scan of {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: ok"))
+            if options["verbosity"] > 1 or scans:
+                for step in plan:
+                    self.stdout.write(f"    {step}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot query(s) fall back to a full table scan.")
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auctions.services import close_expired_listings, expired_listings
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker that closes auctions whose end time has passed, in batches. "
+        "Closing is idempotent, so several workers can run side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds to wait when nothing is due.")
+        parser.add_argument("--once", action="store_true", help="Close everything that is due, then exit.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        try:
+            while True:
+                closed = close_expired_listings(batch_size)
+                if closed:
+                    self.stdout.write(f"Closed {len(closed)} expired auction(s).")
+                # A full batch means more are probably due, so go again straight away
+                if len(closed) == batch_size:
+                    continue
+                if options["once"]:
+                    # Another worker may have taken this batch while more are still due
+                    if expired_listings().exists():
+                        continue
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.bulk import CLOSED_AUCTION_FIELDS, FORMATS, closed_auction_rows, encode_rows, format_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every closed auction, with its final price, winner, category and bid count, to a CSV or "
+        "JSONL file for reporting. Rows are fetched a chunk at a time, so memory stays flat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="File to write, or - (the default) for standard output.")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension, else csv.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        format = options["format"] or format_for(options["path"])
+        lines = encode_rows(closed_auction_rows(options["chunk_size"]), CLOSED_AUCTION_FIELDS, format)
+        if options["path"] == "-":
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+        try:
+            with open(options["path"], "w", newline="", encoding="utf-8") as target:
+                target.writelines(lines)
+        except OSError as error:
+            raise CommandError(error)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.bulk import EXPORT_FIELDS, FORMATS, encode_rows, export_rows, format_for
+from auctions.models import AuctionListing, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream listings to a CSV or JSONL file that import_listings can read back. "
+        "Rows are fetched a chunk at a time, so memory stays flat however many there are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="File to write, or - (the default) for standard output.")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension, else csv.")
+        parser.add_argument("--owner", help="Only export the listings of this seller.")
+        parser.add_argument("--status", choices=("active", "closed", "all"), default="all")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        listings = AuctionListing.objects.all()
+        if options["status"] == "active":
+            listings = listings.active()
+        elif options["status"] == "closed":
+            listings = listings.closed()
+        if options["owner"]:
+            owner = User.objects.filter(username=options["owner"]).first()
+            if owner is None:
+                raise CommandError(f"No user is called {options['owner']!r}.")
+            listings = listings.filter(owner=owner)
+
+        format = options["format"] or format_for(options["path"])
+        lines = encode_rows(export_rows(listings, options["chunk_size"]), EXPORT_FIELDS, format)
+        if options["path"] == "-":
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+        try:
+            with open(options["path"], "w", newline="", encoding="utf-8") as target:
+                target.writelines(lines)
+        except OSError as error:
+            raise CommandError(error)
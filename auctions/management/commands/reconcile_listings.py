@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from auctions.services import drifted_listings, reconcile_bid_state
+
+
+class Command(BaseCommand):
+    help = "Recompute current_price, bid_count and last_bid_at on every listing in bulk from the bid ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report listings whose stored values have drifted; do not write.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = drifted_listings().count()
+        self.stdout.write(f"{drifted} listing(s) out of sync with the bid ledger.")
+        if options["check"]:
+            return
+
+        updated = reconcile_bid_state()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {updated} listing(s)."))
@@ -0,0 +1,103 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from auctions.models import AuctionListing, User
+from auctions.scratch import scratch_database
+from auctions.services import close_expired_listings, expired_listings
+
+
+class Command(BaseCommand):
+    help = (
+        "Soak test for the expiry worker: seed expired auctions, drain them with several "
+        "concurrent workers and fail unless all are closed exactly once within the time limit. "
+        "Runs against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100_000)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--max-seconds", type=float, default=120.0)
+
+    def handle(self, *args, **options):
+        with scratch_database("soak"):
+            self.soak(options)
+
+    def soak(self, options):
+        owner = User.objects.create(username="soak-owner")
+        watcher = User.objects.create(username="soak-watcher")
+
+        started = time.perf_counter()
+        ended = timezone.now() - timedelta(minutes=1)
+        AuctionListing.objects.bulk_create(
+            (
+                AuctionListing(
+                    title=f"soak-{index}", image_url="https://example.com/soak.png", owner=owner, ends_at=ended
+                )
+                for index in range(options["count"])
+            ),
+            batch_size=5_000,
+        )
+        listings = AuctionListing.objects.filter(owner=owner)
+        # Give every tenth listing a watcher so closing has watchlist rows to clear
+        Watch = AuctionListing.watchlist.through
+        Watch.objects.bulk_create(
+            (Watch(auctionlisting_id=pk, user_id=watcher.pk) for pk in listings.values_list("pk", flat=True)[::10]),
+            batch_size=5_000,
+        )
+        self.stdout.write(f"Seeded {options['count']} expired auctions in {time.perf_counter() - started:.1f}s")
+
+        closed_by_workers, errors = [], []
+        # Workers that closed at least one batch, to show the draining was shared
+        busy_workers = set()
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        closed = close_expired_listings(options["batch_size"])
+                    except OperationalError as error:
+                        # SQLite gave up waiting for the write lock; try again
+                        with lock:
+                            errors.append(str(error))
+                        continue
+                    if closed:
+                        with lock:
+                            closed_by_workers.extend(closed)
+                            busy_workers.add(threading.get_ident())
+                    # Under SQLite every worker reads the same first batch and the
+                    # losers close nothing, so only stop once nothing is due
+                    elif not expired_listings().exists():
+                        break
+            finally:
+                connection.close()
+
+        pool = [threading.Thread(target=worker) for _ in range(options["workers"])]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{options['workers']} workers closed {len(closed_by_workers)} auctions in {elapsed:.1f}s "
+            f"({len(closed_by_workers) / elapsed:.0f}/s, {len(busy_workers)} workers closed some, "
+            f"{len(errors)} lock timeouts)"
+        )
+        still_open = listings.filter(is_active=True).count()
+        if still_open:
+            raise CommandError(f"{still_open} expired auctions were left open.")
+        if len(closed_by_workers) != len(set(closed_by_workers)) or len(closed_by_workers) != options["count"]:
+            raise CommandError("Some auctions were closed more than once or not reported.")
+        if Watch.objects.filter(auctionlisting__owner=owner).exists():
+            raise CommandError("Closed auctions still have watchers.")
+        if elapsed > options["max_seconds"]:
+            raise CommandError(f"Draining took {elapsed:.1f}s, over the {options['max_seconds']}s limit.")
+        self.stdout.write(self.style.SUCCESS("OK: every expired auction was closed exactly once."))
@@ -0,0 +1,51 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over every read replica in AUCTIONS_READ_REPLICAS, "
+        "for trying the replica router locally (start the server with AUCTIONS_REPLICAS=N). "
+        "Repeats every --interval seconds, which is how far the replicas lag behind."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between copies.")
+        parser.add_argument("--once", action="store_true", help="Copy once, then exit.")
+
+    def handle(self, *args, **options):
+        replicas = settings.AUCTIONS_READ_REPLICAS
+        if not replicas:
+            raise CommandError("No read replicas are configured; set AUCTIONS_REPLICAS=N.")
+        if any(connections[alias].vendor != "sqlite" for alias in (DEFAULT_DB_ALIAS, *replicas)):
+            raise CommandError("sync_replicas copies SQLite files; other databases replicate themselves.")
+
+        try:
+            while True:
+                started = time.perf_counter()
+                for alias in replicas:
+                    self.copy(alias)
+                self.stdout.write(
+                    f"Copied the primary to {len(replicas)} replica(s) in {(time.perf_counter() - started) * 1000:.0f}ms."
+                )
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+
+    # SQLite's online backup copies a consistent snapshot while the primary takes
+    # writes, and replaces the replica's pages in one transaction, so requests
+    # reading the replica see either the old copy or the new one
+    def copy(self, alias):
+        source = connections[DEFAULT_DB_ALIAS]
+        source.ensure_connection()
+        target = sqlite3.connect(settings.DATABASES[alias]["NAME"], timeout=20)
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:35
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Q, Subquery
+
+
+def backfill_bid_state(apps, schema_editor):
+    AuctionListing = apps.get_model("auctions", "AuctionListing")
+    Bid = apps.get_model("auctions", "Bid")
+    # The current price is whatever bid starting_bid points at; a listing has
+    # received at least one bid once that bid belongs to someone other than the owner
+    AuctionListing.objects.filter(starting_bid__isnull=False).update(
+        current_price=Subquery(Bid.objects.filter(pk=OuterRef("starting_bid")).values("bid")[:1])
+    )
+    AuctionListing.objects.filter(starting_bid__isnull=False).exclude(
+        Q(owner__isnull=True) | Q(starting_bid__user=F("owner"))
+    ).update(bid_count=1)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auctions", "0012_auto_20240730_1525"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auctionlisting",
+            name="bid_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="auctionlisting",
+            name="current_price",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="auctionlisting",
+            name="last_bid_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_bid_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:36
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def link_bids_to_listings(apps, schema_editor):
+    AuctionListing = apps.get_model("auctions", "AuctionListing")
+    Bid = apps.get_model("auctions", "Bid")
+    # Only the bid each listing currently points at can still be traced back to
+    # it. When the owner placed that bid it is the opening price, not a real bid,
+    # so it stays out of the ledger. Earlier overwritten bids cannot be recovered.
+    Bid.objects.filter(bid_price__isnull=False).exclude(user=F("bid_price__owner")).update(
+        listing=Subquery(AuctionListing.objects.filter(starting_bid=OuterRef("pk")).values("pk")[:1])
+    )
+    # 0013 left last_bid_at empty; the linked bid is now the listing's only one
+    AuctionListing.objects.filter(bids__isnull=False).update(
+        last_bid_at=Subquery(Bid.objects.filter(listing=OuterRef("pk")).values("created_at")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auctions", "0013_listing_bid_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bid",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="bid",
+            name="listing",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="bids",
+                to="auctions.auctionlisting",
+            ),
+        ),
+        migrations.RunPython(link_bids_to_listings, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="auctionlisting",
+            name="starting_bid",
+        ),
+        migrations.AddIndex(
+            model_name="bid",
+            index=models.Index(fields=["listing", "-bid", "created_at"], name="bid_listing_amount_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="bid",
+            index=models.Index(fields=["user", "-created_at"], name="bid_user_recent_idx"),
+        ),
+    ]
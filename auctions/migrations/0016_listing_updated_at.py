@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auctions", "0015_listing_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auctionlisting",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="auctionlisting",
+            index=models.Index(fields=["category", "updated_at"], name="listing_category_updated_idx"),
+        ),
+    ]
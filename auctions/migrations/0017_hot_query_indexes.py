@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auctions", "0016_listing_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="auctionlisting",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["id"], name="listing_active_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="auctionlisting",
+            index=models.Index(condition=models.Q(("is_active", False)), fields=["id"], name="listing_closed_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="auctionlisting",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["category", "id"],
+                name="listing_active_category_idx",
+            ),
+        ),
+    ]
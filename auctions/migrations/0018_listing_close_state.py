@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:44
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_winners(apps, schema_editor):
+    AuctionListing = apps.get_model("auctions", "AuctionListing")
+    Bid = apps.get_model("auctions", "Bid")
+    # Auctions closed before this migration are awarded to their top bid; when
+    # they were closed is not recorded anywhere, so closed_at stays empty
+    top_bidder = Bid.objects.filter(listing=OuterRef("pk")).order_by("-bid", "created_at").values("user")[:1]
+    AuctionListing.objects.filter(is_active=False).update(winner=Subquery(top_bidder))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auctions", "0017_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auctionlisting",
+            name="closed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="auctionlisting",
+            name="winner",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="won_listings",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(backfill_winners, migrations.RunPython.noop),
+    ]
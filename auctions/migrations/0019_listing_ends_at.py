@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auctions", "0018_listing_close_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auctionlisting",
+            name="ends_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="auctionlisting",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["ends_at"],
+                name="listing_active_ends_at_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_watchers(apps, schema_editor):
+    AuctionListing = apps.get_model("auctions", "AuctionListing")
+    Watch = AuctionListing.watchlist.through
+    watchers = (
+        Watch.objects.filter(auctionlisting=OuterRef("pk"))
+        .order_by()
+        .values("auctionlisting")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    AuctionListing.objects.update(watcher_count=Coalesce(Subquery(watchers), 0))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auctions", "0019_listing_ends_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auctionlisting",
+            name="watcher_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_watchers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auctions", "0020_listing_watcher_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
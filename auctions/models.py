@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+
+from .cards import CARD_FIELDS, CardIterable
 
 class User(AbstractUser):
     def __str__(self):
@@ -11,19 +14,101 @@ class Category(models.Model):
     def __str__(self):
         return self.category_name
     
+class BidQuerySet(models.QuerySet):
+    # Bid history of a listing, highest (and therefore latest) first
+    def history(self, listing):
+        return self.filter(listing=listing).order_by("-bid", "created_at")
+
+    # The winning bid of a listing, or None if nobody has bid yet
+    def top(self, listing):
+        return self.history(listing).first()
+
+    # Every bid a user has placed, most recent first
+    def placed_by(self, user):
+        return self.filter(user=user).order_by("-created_at")
+
+
+# Append-only bid ledger: rows are only ever inserted by services.place_bid
 class Bid(models.Model):
     bid = models.IntegerField(default=0)
     user = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True, related_name="bid_user")
+    # The composite index below leads with listing, so the FK needs no index of its own
+    listing = models.ForeignKey("AuctionListing", on_delete=models.CASCADE, blank=True, null=True, related_name="bids", db_index=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = BidQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["listing", "-bid", "created_at"], name="bid_listing_amount_idx"),
+            models.Index(fields=["user", "-created_at"], name="bid_user_recent_idx"),
+        ]
+
+class AuctionListingQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(is_active=True)
+
+    def closed(self):
+        return self.filter(is_active=False)
+
+    # Only the columns a listing card renders, with owner and category joined
+    # in, so grids cost one query however many listings they show
+    def for_cards(self, *extra_fields):
+        return self.select_related("owner", "category").only(
+            "id", "title", "image_url", "current_price", "owner__username", "category__category_name", *extra_fields
+        )
+
+    # The same columns as ListingCard objects (see cards.py) for the listing grids,
+    # which never need a model instance. Extra fields must be ListingCard fields.
+    def cards(self, *extra_fields):
+        queryset = self.values_list(*CARD_FIELDS, *extra_fields)
+        queryset._iterable_class = CardIterable
+        return queryset
+
+    # A single listing with everything the listing page dereferences
+    def for_detail(self):
+        return self.select_related("owner", "category")
+
 
 class AuctionListing(models.Model):
     title = models.CharField(max_length=225)
     description = models.CharField(max_length=225)
     image_url = models.URLField(max_length=500)
-    starting_bid = models.ForeignKey(Bid, on_delete=models.CASCADE, blank=True, null=True, related_name="bid_price")
     is_active = models.BooleanField(default=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True, related_name="listings")
     category = models.ForeignKey(Category, on_delete=models.CASCADE, blank=True, null=True, related_name="listings")
     watchlist = models.ManyToManyField(User, blank=True, related_name="listing_watchlist")
+    # Denormalized bid state, maintained by services.place_bid so grids never join to Bid.
+    # Until the first bid arrives current_price holds the opening price.
+    current_price = models.IntegerField(default=0)
+    bid_count = models.PositiveIntegerField(default=0)
+    last_bid_at = models.DateTimeField(blank=True, null=True)
+    # Number of watchlist rows, maintained by the watchlist module so pages never count them
+    watcher_count = models.PositiveIntegerField(default=0)
+    # Optional scheduled end; the close_expired_auctions worker closes the listing once it passes
+    ends_at = models.DateTimeField(blank=True, null=True)
+    # Set when the auction is closed: the top bidder at that moment, if any
+    winner = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name="won_listings")
+    closed_at = models.DateTimeField(blank=True, null=True)
+    # Any change to the listing, including bids, moves this forward; the category
+    # pages derive their ETag and Last-Modified validators from it
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AuctionListingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Partial indexes matching the grid queries: active or closed listings
+            # in id order, and active listings of one category in id order
+            models.Index(fields=["id"], condition=models.Q(is_active=True), name="listing_active_idx"),
+            models.Index(fields=["id"], condition=models.Q(is_active=False), name="listing_closed_idx"),
+            models.Index(
+                fields=["category", "id"], condition=models.Q(is_active=True), name="listing_active_category_idx"
+            ),
+            models.Index(fields=["category", "updated_at"], name="listing_category_updated_idx"),
+            # What the expiry worker polls: open listings by end time
+            models.Index(fields=["ends_at"], condition=models.Q(is_active=True), name="listing_active_ends_at_idx"),
+        ]
 
     def __str__(self):
         return self.title
@@ -32,6 +117,7 @@ class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True, related_name="user_comment")
     listing = models.ForeignKey(AuctionListing, on_delete=models.CASCADE, blank=True, null=True, related_name="listing_comment")
     message = models.CharField(max_length=225)
+    created_at = models.DateTimeField(default=timezone.now)
 
     def __str__ (self):
         return f"{self.author} comment on {self.listing}"
@@ -0,0 +1,23 @@
+from django.db import connection
+
+# SQLite reports no IntegerField range; it stores every integer in 64 bits
+SQLITE_MAX_INTEGER = 2**63 - 1
+
+
+# The largest value the database stores in an IntegerField
+def max_integer():
+    return connection.ops.integer_field_range("IntegerField")[1] or SQLITE_MAX_INTEGER
+
+
+# A whole number from user input (an int, or a string int() accepts) that an
+# IntegerField can store, or None. str.isdigit() is no test: it passes "²", which
+# int() rejects, and any number of digits, which the database rejects.
+def parse_whole_number(value):
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            return None
+    if not isinstance(value, int) or isinstance(value, bool):
+        return None
+    return value if 0 <= value <= max_integer() else None
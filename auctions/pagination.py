@@ -0,0 +1,59 @@
+from django.conf import settings
+
+from .numbers import max_integer
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset and the cursor of the page after it."""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+# Read the ?after= cursor from a request, ignoring anything that isn't an id: only
+# ASCII digits, and no more than the database can compare ids against
+def get_cursor(request):
+    after = request.GET.get("after", "")
+    if not (after.isascii() and after.isdigit()):
+        return None
+    after = int(after)
+    return after if after <= max_integer() else None
+
+
+def _page_queryset(queryset, after, page_size):
+    queryset = queryset.order_by("id")
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    # Fetch one extra row to learn whether another page exists
+    return queryset[:page_size + 1]
+
+
+def _page(items, page_size):
+    if len(items) > page_size:
+        items = items[:page_size]
+        # Rows may be model instances or values() dicts
+        last = items[-1]
+        return KeysetPage(items, last["id"] if isinstance(last, dict) else last.id)
+    return KeysetPage(items, None)
+
+
+# Fetch the page of rows that follows the cursor. Filtering on id > cursor walks
+# the primary key index, so deep pages cost the same as the first one, unlike OFFSET.
+def keyset_page(queryset, after=None, page_size=None):
+    if page_size is None:
+        page_size = settings.AUCTIONS_PAGE_SIZE
+    return _page(list(_page_queryset(queryset, after, page_size)), page_size)
+
+
+# keyset_page() for async views
+async def akeyset_page(queryset, after=None, page_size=None):
+    if page_size is None:
+        page_size = settings.AUCTIONS_PAGE_SIZE
+    return _page([item async for item in _page_queryset(queryset, after, page_size)], page_size)
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+class Subscription:
+    """
+    One listener on a channel, consumed from an event loop.
+
+    Only the latest message matters for live prices, so a subscription holds a
+    single pending message and a newer one replaces it. Memory per subscriber
+    stays constant however fast bids arrive.
+    """
+
+    def __init__(self, broker, channel):
+        self._broker = broker
+        self.channel = channel
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._message = None
+
+    # Called from any thread by the broker
+    def deliver(self, message):
+        self._loop.call_soon_threadsafe(self._set, message)
+
+    def _set(self, message):
+        self._message = message
+        self._ready.set()
+
+    # Wait for the next message, or return None once the timeout passes
+    async def get(self, timeout=None):
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+        return self._message
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process pub/sub: messages reach the subscribers of this process only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def has_subscribers(self, channel):
+        return bool(self._subscriptions.get(channel))
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+
+class RedisBroker(LocalBroker):
+    """
+    Pub/sub through a Redis-compatible server, so every worker process sees every bid.
+
+    Each process keeps a single server connection that listens on every listing
+    channel and hands messages to its local subscribers, instead of one connection
+    per subscriber.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured("AUCTIONS_PUBSUB_URL requires the 'redis' package.")
+        self._url = url
+        self._client = redis.Redis.from_url(url)
+        self._async_redis = redis.asyncio
+        self._listener = None
+
+    # Other processes may have subscribers, so every message must be sent
+    def has_subscribers(self, channel):
+        return True
+
+    def subscribe(self, channel):
+        subscription = super().subscribe(channel)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return subscription
+
+    def publish(self, channel, message):
+        self._client.publish(channel, json.dumps(message))
+
+    async def _listen(self):
+        client = self._async_redis.Redis.from_url(self._url)
+        async with client.pubsub() as pubsub:
+            await pubsub.psubscribe(listing_channel("*"))
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                # Anyone with access to the server can publish, so a message that is
+                # not ours is dropped rather than left to end the listener
+                try:
+                    channel = message["channel"].decode()
+                    data = json.loads(message["data"])
+                except ValueError:
+                    continue
+                super().publish(channel, data)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+# The process-wide broker, picked by the AUCTIONS_PUBSUB_URL setting
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                url = settings.AUCTIONS_PUBSUB_URL
+                _broker = RedisBroker(url) if url else LocalBroker()
+    return _broker
+
+
+def listing_channel(listing_id):
+    return f"listing:{listing_id}"
+
+
+# The listing columns a live listing page shows
+LISTING_STATE_FIELDS = ("current_price", "bid_count", "is_active")
+
+
+# The JSON message pushed to live listing pages, from a values() row
+def listing_state(row):
+    return {
+        "price": row["current_price"],
+        "bid_count": row["bid_count"],
+        "is_active": row["is_active"],
+    }
@@ -0,0 +1,142 @@
+import re
+
+from django.db import connection
+from django.db.models import Count, Max
+from django.test.utils import CaptureQueriesContext
+
+from . import search
+from .models import AuctionListing, Bid, Comment
+from .services import expired_listings
+
+# A bare "SCAN <table>" step reads every row. Index scans ("SCAN t USING INDEX i")
+# and virtual tables such as the FTS5 index are fine.
+FULL_SCAN_RE = re.compile(r"^SCAN (\S+)$")
+
+# Sample values the hot queries are planned with; the plan does not depend on them
+SAMPLE_ID = 1
+
+HOT_QUERIES = {}
+
+
+# Register a function returning the (sql, params) of a query the views run on every request
+def hot_query(name):
+    def register(build):
+        HOT_QUERIES[name] = build
+        return build
+
+    return register
+
+
+def _sql(queryset):
+    return queryset.query.sql_with_params()
+
+
+# aggregate() and count() run at once instead of returning a queryset, so run the
+# call and take the one query it made, with its parameters already inlined
+def _run(call):
+    with CaptureQueriesContext(connection) as captured:
+        call()
+    [query] = captured.captured_queries
+    return query["sql"], ()
+
+
+@hot_query("index grid")
+def _index_grid():
+    return _sql(AuctionListing.objects.active().cards().filter(id__gt=SAMPLE_ID).order_by("id")[:25])
+
+
+@hot_query("category grid")
+def _category_grid():
+    return _sql(
+        AuctionListing.objects.active().filter(category_id=SAMPLE_ID).cards().order_by("id")[:25]
+    )
+
+
+@hot_query("category validators")
+def _category_validators():
+    return _run(
+        lambda: AuctionListing.objects.filter(category_id=SAMPLE_ID).aggregate(
+            last_modified=Max("updated_at"), total=Count("id")
+        )
+    )
+
+
+@hot_query("closed grid")
+def _closed_grid():
+    return _sql(AuctionListing.objects.closed().cards("description").order_by("id")[:25])
+
+
+@hot_query("expired auctions")
+def _expired_auctions():
+    return _sql(expired_listings().order_by("ends_at").values_list("pk", flat=True)[:500])
+
+
+@hot_query("watchlist grid")
+def _watchlist_grid():
+    return _sql(AuctionListing.objects.active().filter(watchlist=SAMPLE_ID).cards().order_by("id")[:25])
+
+
+@hot_query("listing detail")
+def _listing_detail():
+    return _sql(AuctionListing.objects.for_detail().filter(pk=SAMPLE_ID))
+
+
+@hot_query("watchlist membership")
+def _watchlist_membership():
+    return _sql(AuctionListing.watchlist.through.objects.filter(auctionlisting_id=SAMPLE_ID, user_id=SAMPLE_ID))
+
+
+@hot_query("watched ids")
+def _watched_ids():
+    return _sql(AuctionListing.watchlist.through.objects.filter(user_id=SAMPLE_ID).values_list("auctionlisting_id"))
+
+
+@hot_query("listing comments")
+def _listing_comments():
+    return _sql(
+        Comment.objects.filter(listing_id=SAMPLE_ID, id__gt=SAMPLE_ID).select_related("author").order_by("id")[:21]
+    )
+
+
+@hot_query("comment count")
+def _comment_count():
+    return _run(lambda: Comment.objects.filter(listing_id=SAMPLE_ID).count())
+
+
+@hot_query("owner listings")
+def _owner_listings():
+    return _sql(AuctionListing.objects.filter(owner_id=SAMPLE_ID))
+
+
+@hot_query("top bid")
+def _top_bid():
+    return _sql(Bid.objects.history(SAMPLE_ID)[:1])
+
+
+@hot_query("user bids")
+def _user_bids():
+    return _sql(Bid.objects.placed_by(SAMPLE_ID))
+
+
+@hot_query("search")
+def _search():
+    sql = (
+        f"SELECT listing.id FROM {search.SEARCH_TABLE} "
+        f"JOIN {AuctionListing._meta.db_table} AS listing ON listing.id = {search.SEARCH_TABLE}.rowid "
+        f"WHERE {search.SEARCH_TABLE} MATCH %s AND listing.is_active "
+        f"ORDER BY bm25({search.SEARCH_TABLE}) LIMIT 25"
+    )
+    return sql, [search.build_match_query("sample")]
+
+
+# The EXPLAIN QUERY PLAN steps of a registered query
+def explain(name):
+    sql, params = HOT_QUERIES[name]()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+# The tables a plan reads in full
+def full_scans(plan):
+    return [match.group(1) for match in map(FULL_SCAN_RE.match, plan) if match]
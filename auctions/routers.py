@@ -0,0 +1,104 @@
+import contextlib
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Read replicas. Writes always go to the primary ('default'). Reads go to a replica
+# only while ReplicaMiddleware is handling a read-only request, so management
+# commands, the shell and every write request read the primary, and so does a
+# browser for a few seconds after it has written something.
+
+# The replica serving the current request's reads, or None for the primary. One
+# replica per request keeps every query of a page on the same snapshot. Context
+# variables follow a request into the worker threads of sync_to_async.
+_replica = contextvars.ContextVar("auctions_read_replica", default=None)
+
+# Set on the response to every write, so the browser's next requests read the primary
+# until the replicas have caught up with what it wrote
+STICKY_COOKIE = "auctions_primary"
+
+
+# Read from the primary within the block. For reads whose result outlives the request,
+# such as the cached grids and counts, which a lagging replica would freeze stale
+# under a version or key that was just invalidated.
+@contextlib.contextmanager
+def primary():
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads to the replica chosen for the request and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None or model._meta.app_label == "sessions":
+            # A session is read right after the login or logout that wrote it
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads in a transaction decide what it writes
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.AUCTIONS_READ_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, schema included
+        return db not in settings.AUCTIONS_READ_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Pick a replica for each read-only request and keep writers on the primary for a while."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _replica.set(self.replica_for(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = _replica.set(self.replica_for(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.finish(request, response)
+
+    def replica_for(self, request):
+        replicas = settings.AUCTIONS_READ_REPLICAS
+        if not replicas or request.method not in ("GET", "HEAD") or STICKY_COOKIE in request.COOKIES:
+            return None
+        return random.choice(replicas)
+
+    def finish(self, request, response):
+        if settings.AUCTIONS_READ_REPLICAS and request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            response.set_cookie(
+                STICKY_COOKIE, "1", max_age=settings.AUCTIONS_REPLICA_STICKY_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
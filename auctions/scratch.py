@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Throwaway databases and caches for the test suite and the benchmark commands, so
+# neither touches db.sqlite3 or the cache directories of the development server.
+
+
+# CACHES with every file-based cache moved under the given directory
+def scratch_caches(directory):
+    caches = {}
+    for alias, options in settings.CACHES.items():
+        options = dict(options)
+        if options["BACKEND"] == "django.core.cache.backends.filebased.FileBasedCache":
+            options["LOCATION"] = os.path.join(directory, alias)
+        caches[alias] = options
+    return caches
+
+
+# Run the block against bench-<name>.sqlite3, created and migrated the way the test
+# runner does it, with file caches in a temporary directory. Both are removed
+# afterwards unless keepdb is set, which keeps the database for the next run.
+@contextmanager
+def scratch_database(name, keepdb=False):
+    connection.settings_dict["TEST"]["NAME"] = os.path.join(settings.BASE_DIR, f"bench-{name}.sqlite3")
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb, serialize=False)
+    try:
+        with tempfile.TemporaryDirectory(prefix="auctions-cache-") as directory:
+            with override_settings(CACHES=scratch_caches(directory)):
+                yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+class ScratchCachesRunner(DiscoverRunner):
+    """The default test runner, with file caches in a temporary directory removed after the run."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_directory = tempfile.mkdtemp(prefix="auctions-test-cache-")
+        self.scratch_caches = override_settings(CACHES=scratch_caches(self.cache_directory))
+        self.scratch_caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.scratch_caches.disable()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,111 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Q
+
+from .models import AuctionListing
+
+SEARCH_TABLE = "auctions_listing_fts"
+# Title matches weigh ten times as much as description matches in the ranking
+TITLE_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 1.0
+
+TOKEN_RE = re.compile(r"\w+")
+
+# The triggers that keep the index in step with auctions_auctionlisting, as created
+# by migration 0015. SQLite drops them whenever a migration rebuilds the listing
+# table, so ensure_search_triggers() puts them back after every migrate.
+SEARCH_TRIGGERS = {
+    "auctions_listing_fts_insert": """
+        CREATE TRIGGER auctions_listing_fts_insert AFTER INSERT ON auctions_auctionlisting BEGIN
+            INSERT INTO auctions_listing_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    """,
+    "auctions_listing_fts_delete": """
+        CREATE TRIGGER auctions_listing_fts_delete AFTER DELETE ON auctions_auctionlisting BEGIN
+            INSERT INTO auctions_listing_fts (auctions_listing_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    """,
+    "auctions_listing_fts_update": """
+        CREATE TRIGGER auctions_listing_fts_update AFTER UPDATE OF title, description ON auctions_auctionlisting BEGIN
+            INSERT INTO auctions_listing_fts (auctions_listing_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO auctions_listing_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    """,
+}
+
+
+# Recreate any missing sync trigger and rebuild the index, which may have missed
+# writes while the triggers were gone. Does nothing until migration 0015 has run.
+def ensure_search_triggers(using=DEFAULT_DB_ALIAS):
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+            [f"{SEARCH_TABLE}%"],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if SEARCH_TABLE not in existing:
+            return
+        missing = [sql for name, sql in SEARCH_TRIGGERS.items() if name not in existing]
+        for sql in missing:
+            cursor.execute(sql)
+        if missing:
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+# Turn free text into an FTS5 query: every word is quoted, so operators typed by
+# the user are taken literally, and prefix-matched, so "chess bo" finds "chess board"
+def build_match_query(text):
+    return " ".join(f'"{token}"*' for token in TOKEN_RE.findall(text))
+
+
+# Ids of the listings matching the text, best match first
+def _ranked_ids(match_query, category_id, active_only, limit, offset):
+    listing_table = AuctionListing._meta.db_table
+    where, params = [f"{SEARCH_TABLE} MATCH %s"], [match_query]
+    if active_only:
+        where.append("listing.is_active")
+    if category_id is not None:
+        where.append("listing.category_id = %s")
+        params.append(category_id)
+    sql = (
+        f"SELECT listing.id FROM {SEARCH_TABLE} "
+        f"JOIN {listing_table} AS listing ON listing.id = {SEARCH_TABLE}.rowid "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) "
+        "LIMIT %s OFFSET %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+# Search listing titles and descriptions, returning ranked listing cards.
+# On SQLite this uses the FTS5 index created by migration 0015; other databases
+# fall back to an icontains scan ordered newest first.
+def search_listings(text, category_id=None, active_only=True, limit=24, offset=0):
+    tokens = TOKEN_RE.findall(text)
+    if not tokens:
+        return []
+
+    listings = AuctionListing.objects.for_cards()
+    if connection.vendor != "sqlite":
+        condition = Q()
+        for token in tokens:
+            condition &= Q(title__icontains=token) | Q(description__icontains=token)
+        listings = listings.filter(condition)
+        if active_only:
+            listings = listings.active()
+        if category_id is not None:
+            listings = listings.filter(category_id=category_id)
+        return list(listings.order_by("-id")[offset:offset + limit])
+
+    ids = _ranked_ids(build_match_query(text), category_id, active_only, limit, offset)
+    cards = listings.in_bulk(ids)
+    return [cards[listing_id] for listing_id in ids if listing_id in cards]
@@ -0,0 +1,137 @@
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import AuctionListing, Bid
+from .signals import auction_closed, bid_placed
+from .watchlist import Watch, forget_watched
+
+
+class BidRejected(Exception):
+    """Raised when a bid cannot be placed on a listing."""
+
+
+# Place a bid on a listing, atomically checking it beats the current price
+def place_bid(listing_id, user, amount):
+    now = timezone.now()
+    with transaction.atomic():
+        # Compare-and-swap: the row only changes if the auction is open and the
+        # new amount beats the stored price, so concurrent bids cannot overtake
+        # each other. Being the first write, it also takes SQLite's write lock.
+        updated = AuctionListing.objects.filter(
+            Q(ends_at__isnull=True) | Q(ends_at__gt=now), pk=listing_id, is_active=True, current_price__lt=amount
+        ).update(
+            current_price=amount,
+            bid_count=F("bid_count") + 1,
+            last_bid_at=now,
+            updated_at=now,
+        )
+        if updated:
+            # Append the accepted bid to the ledger in the same transaction
+            new_bid = Bid.objects.create(listing_id=listing_id, user=user, bid=amount, created_at=now)
+            transaction.on_commit(lambda: bid_placed.send(sender=Bid, listing_id=listing_id, bid=new_bid))
+            return new_bid
+
+    listing = AuctionListing.objects.filter(pk=listing_id).values("is_active", "ends_at").first()
+    if listing is None:
+        raise AuctionListing.DoesNotExist("No auction listing matches the given query.")
+    # An auction past its end time stays open until the expiry worker closes it
+    if not listing["is_active"] or (listing["ends_at"] is not None and listing["ends_at"] <= now):
+        raise BidRejected("This auction is no longer active.")
+    raise BidRejected("Bid update failed. Ensure your bid is higher than the current bid.")
+
+
+# Close the given listings in one transaction: mark them inactive, award them to
+# their top bidder, stamp the close time and empty their watchlists with a single
+# bulk DELETE, zeroing their watcher counts. Listings that are already closed are
+# left alone, so closing is idempotent and safe to race. Returns the ids of the
+# listings this call closed.
+def close_listings(listing_ids):
+    now = timezone.now()
+    top_bidder = Bid.objects.filter(listing=OuterRef("pk")).order_by("-bid", "created_at").values("user")[:1]
+    with transaction.atomic():
+        # The conditional update is the first write, so concurrent closers are
+        # serialized and each open listing is claimed by exactly one of them
+        closed = AuctionListing.objects.filter(pk__in=listing_ids, is_active=True).update(
+            is_active=False, winner=Subquery(top_bidder), closed_at=now, updated_at=now, watcher_count=0
+        )
+        if not closed:
+            return []
+
+        # The close time identifies the rows this call claimed
+        claimed = AuctionListing.objects.filter(pk__in=listing_ids, is_active=False, closed_at=now)
+        closed_listings = list(claimed.values_list("pk", "category_id"))
+        watches = Watch.objects.filter(auctionlisting_id__in=claimed.values("pk"))
+        # Their watched ids are cached, so note whose watchlists are about to shrink
+        watcher_ids = list(watches.order_by().values_list("user_id", flat=True).distinct())
+        watches.delete()
+
+        closed_ids = [listing_id for listing_id, _ in closed_listings]
+        category_ids = {category_id for _, category_id in closed_listings}
+        transaction.on_commit(lambda: forget_watched(watcher_ids))
+        transaction.on_commit(lambda: auction_closed.send(
+            sender=AuctionListing, listing_ids=closed_ids, category_ids=category_ids
+        ))
+    return closed_ids
+
+
+# Open auctions whose end time has passed
+def expired_listings():
+    return AuctionListing.objects.filter(is_active=True, ends_at__lte=timezone.now())
+
+
+# Close one batch of auctions whose end time has passed, oldest first.
+# Returns the ids of the listings closed. Under SQLite an empty list may only mean
+# another worker took the same batch, so check expired_listings() before stopping.
+def close_expired_listings(batch_size=500):
+    expired = expired_listings().order_by("ends_at").values_list("pk", flat=True)
+    if not connection.features.has_select_for_update_skip_locked:
+        # SQLite has no row locks. Read the batch outside a transaction and let the
+        # conditional update in close_listings skip rows another worker got to first.
+        return close_listings(list(expired[:batch_size]))
+    with transaction.atomic():
+        # Lock the batch, skipping rows other workers hold, so workers take disjoint batches
+        return close_listings(list(expired.select_for_update(skip_locked=True)[:batch_size]))
+
+
+# The denormalized bid columns of a listing, as derived from the bid ledger
+def ledger_bid_state():
+    bids = Bid.objects.filter(listing=OuterRef("pk"))
+    # Bids only ever go up, so the top bid is also the latest one
+    top_bid = bids.order_by("-bid", "created_at")
+    return {
+        # Listings nobody has bid on keep their opening price
+        "current_price": Coalesce(Subquery(top_bid.values("bid")[:1]), F("current_price")),
+        "bid_count": Coalesce(
+            Subquery(bids.order_by().values("listing").annotate(total=Count("pk")).values("total")), 0
+        ),
+        "last_bid_at": Subquery(top_bid.values("created_at")[:1]),
+    }
+
+
+# Listings whose denormalized bid columns disagree with the bid ledger
+def drifted_listings(listings=None):
+    if listings is None:
+        listings = AuctionListing.objects.all()
+    expected = ledger_bid_state()
+    return listings.annotate(
+        expected_price=expected["current_price"],
+        expected_count=expected["bid_count"],
+        expected_last_bid_at=expected["last_bid_at"],
+    ).exclude(
+        Q(current_price=F("expected_price"))
+        & Q(bid_count=F("expected_count"))
+        & (
+            Q(last_bid_at=F("expected_last_bid_at"))
+            | Q(last_bid_at__isnull=True, expected_last_bid_at__isnull=True)
+        )
+    )
+
+
+# Recompute the denormalized bid columns of the given listings from the bid ledger
+def reconcile_bid_state(listings=None):
+    if listings is None:
+        listings = AuctionListing.objects.all()
+    # One bulk UPDATE ... SET col = (SELECT ...) instead of a save per listing
+    return listings.update(**ledger_bid_state())
@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_migrate, post_save
+from django.dispatch import Signal, receiver
+
+from . import caching, comments, pubsub, watchlist
+from .search import ensure_search_triggers
+from .models import AuctionListing, Category, Comment
+
+# Sent once a bid has been committed, with listing_id and bid arguments
+bid_placed = Signal()
+# Sent once a batch of auctions has been closed, with listing_ids and category_ids arguments
+auction_closed = Signal()
+
+
+# Remember the category a listing was loaded with, so a listing moved to another
+# category also invalidates the grid it left. Read from __dict__, so a deferred
+# column is not loaded for it.
+@receiver(post_init, sender=AuctionListing)
+def remember_category(sender, instance, **kwargs):
+    instance._loaded_category_id = instance.__dict__.get("category_id")
+
+
+# Listing created, edited, closed through save() or deleted
+@receiver(post_save, sender=AuctionListing)
+@receiver(post_delete, sender=AuctionListing)
+def invalidate_listing_grids(sender, instance, **kwargs):
+    category_ids = {instance.category_id, instance._loaded_category_id}
+    caching.bump_versions(
+        caching.ACTIVE_LISTINGS,
+        caching.CLOSED_LISTINGS,
+        *(caching.category_scope(category_id) for category_id in category_ids),
+    )
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(bid_placed)
+def invalidate_grids_on_bid(sender, listing_id, **kwargs):
+    category_id = AuctionListing.objects.filter(pk=listing_id).values_list("category_id", flat=True).first()
+    caching.bump_versions(caching.ACTIVE_LISTINGS, caching.category_scope(category_id))
+
+
+@receiver(auction_closed)
+def invalidate_grids_on_close(sender, category_ids, **kwargs):
+    caching.bump_versions(
+        caching.ACTIVE_LISTINGS,
+        caching.CLOSED_LISTINGS,
+        *(caching.category_scope(category_id) for category_id in category_ids),
+    )
+
+
+# Push the new price to live listing pages. Only listings somebody is watching are
+# looked up, so bids and bulk closes cost nothing extra when nobody is subscribed.
+def publish_listing_states(listing_ids):
+    broker = pubsub.get_broker()
+    channels = {listing_id: pubsub.listing_channel(listing_id) for listing_id in listing_ids}
+    watched = [listing_id for listing_id, channel in channels.items() if broker.has_subscribers(channel)]
+    if not watched:
+        return
+    states = AuctionListing.objects.filter(pk__in=watched).values("pk", *pubsub.LISTING_STATE_FIELDS)
+    for state in states:
+        broker.publish(channels[state["pk"]], pubsub.listing_state(state))
+
+
+@receiver(bid_placed)
+def publish_price_on_bid(sender, listing_id, **kwargs):
+    publish_listing_states([listing_id])
+
+
+@receiver(auction_closed)
+def publish_price_on_close(sender, listing_ids, **kwargs):
+    publish_listing_states(listing_ids)
+
+
+# Category names appear in the category menu and on closed auction cards
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories(sender, instance, **kwargs):
+    caching.bump_versions(caching.CATEGORIES, caching.CLOSED_LISTINGS, caching.category_scope(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def forget_comment_count(sender, instance, **kwargs):
+    comments.forget_comment_counts([instance.listing_id])
+
+
+# Watchlist rows changed through the many-to-many manager (the admin, the shell)
+# rather than watchlist.watch() and unwatch(): recount the listings involved and
+# drop the cached watched ids of the users involved
+@receiver(m2m_changed, sender=AuctionListing.watchlist.through)
+def sync_watchlist(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # pk_set is empty on clear(), so note who is affected while the rows still exist
+        field = "auctionlisting_id" if reverse else "user_id"
+        owner = "user_id" if reverse else "auctionlisting_id"
+        pk_set = set(sender.objects.filter(**{owner: instance.pk}).values_list(field, flat=True))
+        instance._watchlist_cleared = pk_set
+        return
+    if action == "post_clear":
+        pk_set = instance.__dict__.pop("_watchlist_cleared", set())
+    elif action not in ("post_add", "post_remove"):
+        return
+
+    listing_ids, user_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    watchlist.recount_watchers(listing_ids)
+    watchlist.forget_watched(user_ids)
+
+
+# SQLite drops the search index triggers whenever a migration rebuilds the listing table
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.name == "auctions":
+        ensure_search_triggers(using)
+
+
+# The pragmas of the SQLite profile that a checked-in database file skips (see
+# AUCTIONS_SQLITE_CHECKED_IN): the journal mode is written into the file, and
+# synchronous=NORMAL is only safe once that mode is WAL
+WAL_PRAGMAS = {"journal_mode", "synchronous"}
+
+
+# Apply the SQLite profile from settings to every new connection. The pragmas go
+# straight to the driver, so they are not counted as queries of whichever request
+# happens to open the connection.
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    checked_in = connection.settings_dict["NAME"] in settings.AUCTIONS_SQLITE_CHECKED_IN
+    for pragma, value in settings.AUCTIONS_SQLITE_PRAGMAS.items():
+        if checked_in and pragma in WAL_PRAGMAS:
+            continue
+        connection.connection.execute(f"PRAGMA {pragma} = {value}")
+    # A write routed to a replica would be lost at the next sync_replicas, so fail it
+    if connection.alias in settings.AUCTIONS_READ_REPLICAS:
+        connection.connection.execute("PRAGMA query_only = ON")
@@ -33,3 +33,53 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 });
+
+// Live price updates on the listing page, pushed by the server as server-sent events
+document.addEventListener('DOMContentLoaded', () => {
+    const price = document.querySelector('[data-live-price]');
+    if (!price || !window.EventSource) {
+        return;
+    }
+    const bidCount = document.querySelector('[data-live-bid-count]');
+    const source = new EventSource(price.dataset.livePrice);
+
+    source.addEventListener('price', (event) => {
+        const state = JSON.parse(event.data);
+        price.textContent = state.price;
+        if (bidCount) {
+            bidCount.textContent = state.bid_count;
+        }
+        // A closed auction has nothing more to report
+        if (!state.is_active) {
+            source.close();
+        }
+    });
+});
+
+// Mark the listings on the page that are in the user's watchlist. Listing grids are
+// cached and shared by every user, so the page carries the watched ids separately.
+document.addEventListener('DOMContentLoaded', () => {
+    const data = document.getElementById('watched-listings');
+    if (!data) {
+        return;
+    }
+    const watched = new Set(JSON.parse(data.textContent));
+    document.querySelectorAll('[data-watch-listing]').forEach(heart => {
+        heart.hidden = !watched.has(Number(heart.dataset.watchListing));
+    });
+});
+
+// Listing pages render the first comments only; "Load more" fetches the next page
+// and puts it, with its own "Load more" link if there is one, in place of the link
+document.addEventListener('click', (event) => {
+    const link = event.target.closest('[data-load-comments]');
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+    fetch(link.href, { credentials: 'same-origin' })
+        .then(response => response.ok ? response.text() : Promise.reject(response))
+        .then(html => link.insertAdjacentHTML('beforebegin', html))
+        .then(() => link.remove())
+        .catch(() => {});
+});
@@ -0,0 +1,103 @@
+import itertools
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import AuctionListing, Bid, Category, Comment, User
+from .watchlist import Watch
+
+# Synthetic catalogues for the benchmarks: users, categories, listings with a
+# consistent bid history, comments and watchlists, inserted with bulk_create a
+# chunk of listings at a time so seeding a million listings runs in flat memory.
+
+CATEGORY_COUNT = 40
+# One user for every USERS_PER_LISTING listings, with a floor for small catalogues
+USERS_PER_LISTING = 20
+MIN_USERS = 200
+# Share of listings that are already closed
+CLOSED_RATIO = 0.1
+
+WORDS = (
+    "vintage", "oak", "brass", "lamp", "chair", "mirror", "clock", "vase", "rug", "print", "camera", "guitar",
+    "bicycle", "desk", "kettle", "radio", "poster", "jacket", "watch", "globe", "atlas", "teapot", "stool", "frame",
+)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+# Insert a catalogue of `listings` listings and everything around them. The same
+# seed always produces the same data. Returns the number of rows created per model.
+def seed(listings, seed=42, chunk_size=5000):
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    categories = Category.objects.bulk_create(
+        Category(category_name=f"Synthetic {index}") for index in range(CATEGORY_COUNT)
+    )
+    category_ids = [category.pk for category in categories]
+
+    user_ids = []
+    for chunk in _chunks(range(max(MIN_USERS, listings // USERS_PER_LISTING)), chunk_size):
+        # "!" is an unusable password hash, so nobody can sign in as a synthetic user
+        users = User.objects.bulk_create(User(username=f"synthetic-{index}", password="!") for index in chunk)
+        user_ids.extend(user.pk for user in users)
+
+    counts = dict.fromkeys(("listings", "bids", "comments", "watches"), 0)
+    counts.update(users=len(user_ids), categories=len(category_ids))
+    for chunk in _chunks(range(listings), chunk_size):
+        plans = [_plan_listing(rng, index, user_ids, category_ids, now) for index in chunk]
+        created = AuctionListing.objects.bulk_create(listing for listing, _, _, _ in plans)
+        bids, comments, watches = [], [], []
+        for listing, (_, bid_plan, comment_plan, watcher_ids) in zip(created, plans):
+            bids += (Bid(listing_id=listing.pk, **fields) for fields in bid_plan)
+            comments += (Comment(listing_id=listing.pk, **fields) for fields in comment_plan)
+            watches += (Watch(auctionlisting_id=listing.pk, user_id=user_id) for user_id in watcher_ids)
+        Bid.objects.bulk_create(bids)
+        Comment.objects.bulk_create(comments)
+        Watch.objects.bulk_create(watches)
+        counts["listings"] += len(created)
+        counts["bids"] += len(bids)
+        counts["comments"] += len(comments)
+        counts["watches"] += len(watches)
+    return counts
+
+
+# One unsaved listing with its bids, comments and watchers, all consistent with the
+# denormalized price, bid count, watcher count and winner on the listing itself
+def _plan_listing(rng, index, user_ids, category_ids, now):
+    created_at = now - timedelta(days=30) + timedelta(seconds=index)
+    price = rng.randint(1, 500)
+    bids = []
+    for _ in range(rng.choice((0, 0, 1, 2, 3, 4, 6))):
+        price += rng.randint(1, 50)
+        bids.append({"user_id": rng.choice(user_ids), "bid": price, "created_at": created_at})
+        created_at += timedelta(minutes=rng.randint(1, 600))
+    comments = [
+        {"author_id": rng.choice(user_ids), "message": " ".join(rng.choices(WORDS, k=6)), "created_at": created_at}
+        for _ in range(rng.choice((0, 0, 1, 1, 2, 3)))
+    ]
+
+    is_active = rng.random() >= CLOSED_RATIO
+    # Closing a listing empties its watchlist
+    watcher_ids = set(rng.choices(user_ids, k=rng.choice((0, 0, 1, 2, 4)))) if is_active else set()
+    title = " ".join(rng.choices(WORDS, k=3)).capitalize()
+    listing = AuctionListing(
+        title=f"{title} #{index}",
+        description=" ".join(rng.choices(WORDS, k=12)),
+        image_url=f"https://example.com/synthetic/{index}.png",
+        owner_id=rng.choice(user_ids),
+        category_id=rng.choice(category_ids),
+        is_active=is_active,
+        current_price=price,
+        bid_count=len(bids),
+        last_bid_at=bids[-1]["created_at"] if bids else None,
+        watcher_count=len(watcher_ids),
+        winner_id=None if is_active or not bids else bids[-1]["user_id"],
+        closed_at=None if is_active else created_at,
+    )
+    return listing, bids, comments, watcher_ids
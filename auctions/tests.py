@@ -1,3 +1,1385 @@
-from django.test import TestCase
+import asyncio
+import io
+import itertools
+import json
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import async_views, bulk, caching, instrumentation, pubsub, query_plans, routers, synthetic, views, watchlist
+from .api import LISTING_FIELDS
+from .cards import ListingCard
+from .categories import registry
+from .comments import comment_count
+from .events import EventStreamApp
+from .models import AuctionListing, Bid, Category, Comment, User
+from .pagination import keyset_page
+from .search import search_listings
+from .services import BidRejected, close_expired_listings, close_listings, drifted_listings, place_bid
+
+
+class ListingQueryCountTests(TestCase):
+    """Every listing page must cost the same number of queries however much it shows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("alice", "alice@example.com", "password")
+        cls.category = Category.objects.create(category_name="Books")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_listings(self, count, **fields):
+        # Each listing gets its own owner so a per-row owner lookup would show up
+        owners = User.objects.bulk_create(
+            User(username=f"owner-{User.objects.count()}-{index}") for index in range(count)
+        )
+        listings = AuctionListing.objects.bulk_create(
+            AuctionListing(
+                title=f"Listing {index}",
+                description="A listing",
+                image_url="https://example.com/image.png",
+                current_price=10,
+                owner=owner,
+                category=self.category,
+                **fields,
+            )
+            for index, owner in enumerate(owners)
+        )
+        return listings
+
+    def assertConstantQueries(self, expected, url, setup, method="get", data=None):
+        # Render the page with a handful of rows, then again with many more
+        for count in (1, 25):
+            setup(count)
+            # Measure the uncached path
+            cache.clear()
+            with self.assertNumQueries(expected):
+                response = getattr(self.client, method)(url, data or {})
+            self.assertEqual(response.status_code, 200)
+
+    def test_index(self):
+        # The watched ids for the hearts cost one query until they are cached
+        self.assertConstantQueries(3, reverse("index"), self.create_listings)
+
+    def test_display(self):
+        self.assertConstantQueries(4, reverse("display"), self.create_listings)
+
+    def test_category(self):
+        self.assertConstantQueries(5, reverse("category", args=(self.category.pk,)), self.create_listings)
+
+    def test_closed_auctions(self):
+        self.assertConstantQueries(
+            2, reverse("closed_auctions"), lambda count: self.create_listings(count, is_active=False)
+        )
+
+    def test_watchlist(self):
+        def watch_listings(count):
+            for listing in self.create_listings(count):
+                listing.watchlist.add(self.user)
+
+        self.assertConstantQueries(2, reverse("watchlist"), watch_listings)
+
+    def test_listing_with_comments(self):
+        listing = self.create_listings(1)[0]
+
+        def add_comments(count):
+            authors = User.objects.bulk_create(
+                User(username=f"author-{Comment.objects.count()}-{index}") for index in range(count)
+            )
+            Comment.objects.bulk_create(
+                Comment(author=author, listing=listing, message="Nice") for author in authors
+            )
+
+        # The comment count costs one query until it is cached
+        self.assertConstantQueries(5, reverse("listing", args=(listing.pk,)), add_comments)
+
+
+@override_settings(AUCTIONS_COMMENTS_PAGE_SIZE=2)
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("ines", "ines@example.com", "password")
+        cls.listing = AuctionListing.objects.create(title="Lamp", image_url="https://example.com/lamp.png")
+        cls.comments = [
+            Comment.objects.create(author=cls.user, listing=cls.listing, message=f"Comment {index}")
+            for index in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_listing_page_shows_the_first_page_and_the_total(self):
+        response = self.client.get(reverse("listing", args=(self.listing.pk,)))
+        self.assertContains(response, "Comments (5)")
+        self.assertContains(response, "Comment 1")
+        self.assertNotContains(response, "Comment 2")
+        self.assertContains(
+            response, f'{reverse("listing_comments", args=(self.listing.pk,))}?after={self.comments[1].pk}'
+        )
+
+    def test_load_more_walks_the_rest(self):
+        url = reverse("listing_comments", args=(self.listing.pk,))
+        response = self.client.get(url, {"after": self.comments[1].pk})
+        self.assertEqual(response.context["comments"].items, self.comments[2:4])
+        self.assertContains(response, "data-load-comments")
+
+        response = self.client.get(url, {"after": self.comments[3].pk})
+        self.assertEqual(response.context["comments"].items, self.comments[4:])
+        self.assertNotContains(response, "data-load-comments")
+
+    def test_count_is_cached_until_a_comment_is_added(self):
+        self.client.get(reverse("listing", args=(self.listing.pk,)))
+        with self.assertNumQueries(0):
+            self.assertEqual(comment_count(self.listing.pk), 5)
+        self.client.post(reverse("add_comment", args=(self.listing.pk,)), {"new_comment": "One more"})
+        self.assertEqual(comment_count(self.listing.pk), 6)
+
+
+class ListingCardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("uma", "uma@example.com", "password")
+        cls.category = Category.objects.create(category_name="Clocks")
+        cls.listing = AuctionListing.objects.create(
+            title="Carriage clock",
+            description="Brass, still ticking",
+            image_url="https://example.com/clock.png",
+            current_price=40,
+            owner=cls.owner,
+            category=cls.category,
+            is_active=False,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cards_carry_what_the_grids_render(self):
+        card = AuctionListing.objects.closed().cards("description").get()
+        self.assertEqual(card, ListingCard(
+            self.listing.pk, "Carriage clock", "https://example.com/clock.png", 40, "uma", "Clocks",
+            "Brass, still ticking",
+        ))
+        self.assertFalse(hasattr(card, "__dict__"))
+
+    def test_closed_grid_renders_cards(self):
+        response = self.client.get(reverse("closed_auctions"))
+        self.assertContains(response, "<strong>Final Bid:</strong> 40")
+        self.assertContains(response, "<strong>Category:</strong> Clocks")
+        self.assertContains(response, "<strong>Owner:</strong> uma")
+
+
+@override_settings(AUCTIONS_PAGE_SIZE=2)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("bob", "bob@example.com", "password")
+        cls.listings = AuctionListing.objects.bulk_create(
+            AuctionListing(title=f"Listing {index}", image_url="https://example.com/image.png", owner=cls.owner)
+            for index in range(5)
+        )
+
+    def test_walks_every_listing_once(self):
+        seen, after = [], None
+        while True:
+            page = keyset_page(AuctionListing.objects.all(), after)
+            seen.extend(listing.pk for listing in page)
+            after = page.next_cursor
+            if after is None:
+                break
+        self.assertEqual(seen, [listing.pk for listing in self.listings])
+
+    def test_renders_next_page_link(self):
+        cache.clear()
+        response = self.client.get(reverse("index"), {"after": self.listings[0].pk})
+        self.assertContains(response, f"after={self.listings[2].pk}")
+
+    def test_ignores_malformed_cursor(self):
+        response = self.client.get(reverse("closed_auctions"), {"after": "nope"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_ignores_cursor_the_database_cannot_compare(self):
+        urls = [
+            reverse("index"),
+            reverse("display"),
+            reverse("closed_auctions"),
+            reverse("listing_comments", args=(self.listings[0].pk,)),
+            reverse("api_listings"),
+        ]
+        for url, after in itertools.product(urls, ("9" * 20, "\u00b2", "\u0661")):
+            with self.subTest(url=url, after=after):
+                self.assertEqual(self.client.get(url, {"after": after}).status_code, 200)
+
+
+class GridCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("carol", "carol@example.com", "password")
+        cls.category = Category.objects.create(category_name="Games")
+
+    def setUp(self):
+        cache.clear()
+
+    def create_listing(self, title="Chess set"):
+        return AuctionListing.objects.create(
+            title=title, image_url="https://example.com/chess.png", owner=self.owner, category=self.category
+        )
+
+    def test_second_request_is_served_from_cache(self):
+        self.create_listing()
+        self.client.get(reverse("index"))
+        with self.assertNumQueries(0):
+            self.client.get(reverse("index"))
+        self.assertEqual(caching.get_stats(), {"hits": 1, "misses": 1})
+
+    def test_new_listing_invalidates_grids(self):
+        self.client.get(reverse("category", args=(self.category.pk,)))
+        self.create_listing(title="Go board")
+        self.assertContains(self.client.get(reverse("category", args=(self.category.pk,))), "Go board")
+
+    def test_closing_invalidates_closed_grid(self):
+        listing = self.create_listing(title="Backgammon")
+        self.client.get(reverse("closed_auctions"))
+        self.client.force_login(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("close_auction", args=(listing.pk,)))
+        self.assertContains(self.client.get(reverse("closed_auctions")), "Backgammon")
+
+    def test_moving_a_listing_invalidates_the_category_it_left(self):
+        listing = self.create_listing(title="Mahjong")
+        old_page = reverse("category", args=(self.category.pk,))
+        self.assertContains(self.client.get(old_page), "Mahjong")
+        listing = AuctionListing.objects.get(pk=listing.pk)
+        listing.category = Category.objects.create(category_name="Tiles")
+        listing.save()
+        self.assertNotContains(self.client.get(old_page), "Mahjong")
+
+    def test_staff_see_the_counters_of_the_running_server(self):
+        self.create_listing()
+        self.client.get(reverse("index"))
+        self.client.get(reverse("index"))
+        self.client.force_login(User.objects.create_user("ed", "ed@example.com", "password", is_staff=True))
+        self.assertEqual(self.client.get(reverse("cache_stats"), {"format": "json"}).json(), {"hits": 1, "misses": 1})
+        self.assertContains(self.client.get(reverse("cache_stats")), "<td>50%</td>")
+        self.client.post(reverse("cache_stats"))
+        self.assertEqual(caching.get_stats(), {"hits": 0, "misses": 0})
+
+    def test_command_reads_the_shared_counters(self):
+        self.create_listing()
+        self.client.get(reverse("index"))
+        out = io.StringIO()
+        call_command("cache_stats", stdout=out)
+        self.assertIn("hits: 0  misses: 1", out.getvalue())
+
+    def test_command_refuses_a_cache_it_does_not_share(self):
+        in_process = {**settings.CACHES, "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        with override_settings(CACHES=in_process), self.assertRaisesMessage(CommandError, "/cache/stats"):
+            call_command("cache_stats")
+
+
+class CategoryRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_looks_up_ids_without_queries(self):
+        books = Category.objects.create(category_name="Books")
+        registry.all()
+        with self.assertNumQueries(0):
+            self.assertEqual(registry.get(str(books.pk)), books)
+            self.assertIsNone(registry.get("not-an-id"))
+            self.assertIsNone(registry.get(books.pk + 1))
+
+    def test_reloads_after_category_changes(self):
+        books = Category.objects.create(category_name="Books")
+        registry.all()
+        books.category_name = "Rare books"
+        books.save()
+        self.assertEqual(registry.get(books.pk).category_name, "Rare books")
+
+    # Changes made by another process, whose cache this one may not share, reach the
+    # copy here without the version stamp moving; bulk_create() and update() send no signals
+    def test_finds_a_category_added_elsewhere_after_a_miss(self):
+        registry.all()
+        added = Category.objects.bulk_create([Category(category_name="Maps")])[0]
+        with mock.patch("auctions.categories.time.monotonic", return_value=time.monotonic() + 2):
+            self.assertEqual(registry.get(added.pk), added)
+
+    @override_settings(AUCTIONS_CATEGORY_MAX_AGE=0)
+    def test_reloads_once_the_copy_is_too_old(self):
+        books = Category.objects.create(category_name="Books")
+        registry.all()
+        Category.objects.filter(pk=books.pk).update(category_name="Rare books")
+        self.assertEqual(registry.get(books.pk).category_name, "Rare books")
+
+    def test_unknown_category_is_not_found(self):
+        self.assertEqual(self.client.get(reverse("display"), {"category": "999"}).status_code, 404)
+        self.assertEqual(self.client.get(reverse("category", args=(999,))).status_code, 404)
+
+
+class ListingSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("erin", "erin@example.com", "password")
+        cls.games = Category.objects.create(category_name="Games")
+
+    def create_listing(self, title, description="", **fields):
+        return AuctionListing.objects.create(
+            title=title, description=description, image_url="https://example.com/image.png", owner=self.owner,
+            **fields
+        )
+
+    def test_ranks_title_matches_first_and_matches_prefixes(self):
+        in_description = self.create_listing("Wooden box", "Holds a chessboard")
+        in_title = self.create_listing("Chessboard", "Walnut")
+        self.assertEqual(search_listings("chess"), [in_title, in_description])
+
+    def test_filters_by_category_and_status(self):
+        open_game = self.create_listing("Chess clock", category=self.games)
+        self.create_listing("Chess book")
+        closed_game = self.create_listing("Chess pieces", category=self.games, is_active=False)
+        self.assertEqual(search_listings("chess", category_id=self.games.pk), [open_game])
+        self.assertCountEqual(
+            search_listings("chess", category_id=self.games.pk, active_only=False), [open_game, closed_game]
+        )
+
+    def test_index_follows_edits_and_deletes(self):
+        listing = self.create_listing("Chess set")
+        listing.title = "Checkers set"
+        listing.save()
+        self.assertEqual(search_listings("chess"), [])
+        self.assertEqual(search_listings("checkers"), [listing])
+        listing.delete()
+        self.assertEqual(search_listings("checkers"), [])
+
+    def test_treats_search_operators_as_text(self):
+        self.create_listing("Chess set")
+        self.assertEqual(search_listings('chess OR "NEAR(*'), [])
+        self.assertEqual(search_listings("   "), [])
+
+    def test_search_page(self):
+        self.create_listing("Chess set")
+        self.assertContains(self.client.get(reverse("search"), {"q": "che"}), "Chess set")
+
+    def test_search_page_clamps_pages_past_the_database_range(self):
+        self.create_listing("Chess set")
+        for page in ("9" * 20, "\u00b2", "0", "-1"):
+            with self.subTest(page=page):
+                self.assertEqual(self.client.get(reverse("search"), {"q": "chess", "page": page}).status_code, 200)
+
+
+class CategoryPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("frank", "frank@example.com", "password")
+        cls.category = Category.objects.create(category_name="Music")
+        cls.listing = AuctionListing.objects.create(
+            title="Guitar", image_url="https://example.com/guitar.png", owner=cls.owner, category=cls.category
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("category", args=(self.category.pk,))
+
+    def test_old_filter_requests_redirect_to_category_url(self):
+        self.assertRedirects(
+            self.client.post(reverse("display"), {"category": self.category.pk}), self.url, status_code=303
+        )
+        self.assertRedirects(
+            self.client.get(reverse("display"), {"category": self.category.pk}), self.url, status_code=303
+        )
+
+    def test_repeat_visit_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, "Guitar")
+        with self.assertNumQueries(1):
+            repeat = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(repeat.status_code, 304)
+        repeat = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_bid_changes_validators(self):
+        etag = self.client.get(self.url)["ETag"]
+        place_bid(self.listing.pk, self.owner, 50)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_signing_in_changes_validators(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_category_ids_the_database_cannot_compare_are_not_found(self):
+        # The ETag and Last-Modified functions run before the view's own 404
+        self.assertEqual(self.client.get("/category/99999999999999999999").status_code, 404)
+
+
+class PlaceBidTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("nick", "nick@example.com", "password")
+        cls.bidder = User.objects.create_user("olga", "olga@example.com", "password")
+        cls.listing = AuctionListing.objects.create(
+            title="Radio", image_url="https://example.com/radio.png", owner=cls.owner, current_price=10
+        )
+
+    def listing_state(self):
+        return AuctionListing.objects.values("current_price", "bid_count").get(pk=self.listing.pk)
+
+    def test_higher_bid_is_accepted(self):
+        bid = place_bid(self.listing.pk, self.bidder, 11)
+        self.assertEqual((bid.listing_id, bid.user, bid.bid), (self.listing.pk, self.bidder, 11))
+        self.assertEqual(self.listing_state(), {"current_price": 11, "bid_count": 1})
+
+    def test_equal_or_lower_bid_is_rejected(self):
+        for amount in (10, 9):
+            with self.subTest(amount=amount), self.assertRaisesMessage(BidRejected, "higher than the current bid"):
+                place_bid(self.listing.pk, self.bidder, amount)
+        self.assertEqual(self.listing_state(), {"current_price": 10, "bid_count": 0})
+        self.assertFalse(self.listing.bids.exists())
+
+    def test_bid_on_closed_listing_is_rejected(self):
+        close_listings([self.listing.pk])
+        with self.assertRaisesMessage(BidRejected, "no longer active"):
+            place_bid(self.listing.pk, self.bidder, 50)
+        self.assertEqual(self.listing_state(), {"current_price": 10, "bid_count": 0})
+
+    def test_missing_listing_does_not_exist(self):
+        with self.assertRaises(AuctionListing.DoesNotExist):
+            place_bid(self.listing.pk + 1, self.bidder, 50)
+
+    def test_bid_form_rejects_amounts_that_are_not_storable_numbers(self):
+        self.client.force_login(self.bidder)
+        for amount in ("\u00b2", "9" * 30, "-5", "ten"):
+            with self.subTest(amount=amount):
+                response = self.client.post(reverse("add_bid", args=(self.listing.pk,)), {"starting_bid": amount}, follow=True)
+                self.assertContains(response, "Bid update failed.")
+        self.assertEqual(self.listing_state(), {"current_price": 10, "bid_count": 0})
+
+
+class BidLedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("quinn", "quinn@example.com", "password")
+        cls.bidder = User.objects.create_user("rosa", "rosa@example.com", "password")
+        cls.rival = User.objects.create_user("sven", "sven@example.com", "password")
+        cls.listing = AuctionListing.objects.create(
+            title="Kettle", image_url="https://example.com/kettle.png", owner=cls.owner, current_price=5
+        )
+        cls.other = AuctionListing.objects.create(
+            title="Toaster", image_url="https://example.com/toaster.png", owner=cls.owner, current_price=5
+        )
+        cls.bids = [
+            place_bid(cls.listing.pk, cls.bidder, 6),
+            place_bid(cls.listing.pk, cls.rival, 8),
+            place_bid(cls.other.pk, cls.bidder, 7),
+            place_bid(cls.listing.pk, cls.bidder, 9),
+        ]
+
+    def test_history_is_highest_first_and_limited_to_the_listing(self):
+        self.assertEqual(list(Bid.objects.history(self.listing).values_list("bid", flat=True)), [9, 8, 6])
+        self.assertEqual(Bid.objects.top(self.listing), self.bids[3])
+
+    def test_top_is_none_without_bids(self):
+        quiet = AuctionListing.objects.create(title="Lamp", image_url="https://example.com/lamp.png", owner=self.owner)
+        self.assertIsNone(Bid.objects.top(quiet))
+
+    def test_placed_by_is_most_recent_first(self):
+        self.assertEqual(list(Bid.objects.placed_by(self.bidder)), [self.bids[3], self.bids[2], self.bids[0]])
+        self.assertEqual(list(Bid.objects.placed_by(self.owner)), [])
+
+
+class ReconcileListingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("tara", "tara@example.com", "password")
+        cls.bidder = User.objects.create_user("ugo", "ugo@example.com", "password")
+        cls.listing = AuctionListing.objects.create(
+            title="Chair", image_url="https://example.com/chair.png", owner=cls.owner, current_price=20
+        )
+        cls.bid = place_bid(cls.listing.pk, cls.bidder, 25)
+        cls.untouched = AuctionListing.objects.create(
+            title="Stool", image_url="https://example.com/stool.png", owner=cls.owner, current_price=15
+        )
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command("reconcile_listings", *args, stdout=out)
+        return out.getvalue()
+
+    def bid_state(self, listing):
+        return AuctionListing.objects.values("current_price", "bid_count", "last_bid_at").get(pk=listing.pk)
+
+    def test_check_reports_drift_without_writing(self):
+        AuctionListing.objects.filter(pk=self.listing.pk).update(current_price=20, bid_count=0, last_bid_at=None)
+        self.assertIn("1 listing(s) out of sync", self.reconcile("--check"))
+        self.assertEqual(self.bid_state(self.listing), {"current_price": 20, "bid_count": 0, "last_bid_at": None})
+
+    def test_reconcile_restores_the_ledger_state(self):
+        AuctionListing.objects.filter(pk=self.listing.pk).update(current_price=20, bid_count=3, last_bid_at=None)
+        self.assertIn("Reconciled 2 listing(s).", self.reconcile())
+        self.assertEqual(
+            self.bid_state(self.listing), {"current_price": 25, "bid_count": 1, "last_bid_at": self.bid.created_at}
+        )
+        # A listing nobody has bid on keeps its opening price
+        self.assertEqual(self.bid_state(self.untouched), {"current_price": 15, "bid_count": 0, "last_bid_at": None})
+        self.assertIn("0 listing(s) out of sync", self.reconcile("--check"))
+
+
+class BidLedgerMigrationTests(TransactionTestCase):
+    """0014 links each listing's current bid to it and must leave no drift for reconcile_listings."""
+
+    before = [("auctions", "0013_listing_bid_state")]
+    after = [("auctions", "0014_bid_ledger")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_linked_bid_sets_last_bid_at(self):
+        apps = self.migrate(self.before)
+        User, Listing, OldBid = (apps.get_model("auctions", name) for name in ("User", "AuctionListing", "Bid"))
+        owner = User.objects.create(username="vera")
+        bidder = User.objects.create(username="wim")
+        opening = OldBid.objects.create(bid=10, user=owner)
+        outbid = OldBid.objects.create(bid=30, user=bidder)
+        # As 0013 backfilled them: the price and count follow starting_bid, last_bid_at stays empty
+        unbid = Listing.objects.create(
+            title="Desk", image_url="https://example.com/desk.png", owner=owner, starting_bid=opening, current_price=10
+        )
+        bid_on = Listing.objects.create(
+            title="Sofa",
+            image_url="https://example.com/sofa.png",
+            owner=owner,
+            starting_bid=outbid,
+            current_price=30,
+            bid_count=1,
+        )
+
+        apps = self.migrate(self.after)
+        Listing, NewBid = (apps.get_model("auctions", name) for name in ("AuctionListing", "Bid"))
+        linked = NewBid.objects.get(pk=outbid.pk)
+        self.assertEqual(linked.listing_id, bid_on.pk)
+        self.assertEqual(
+            Listing.objects.values("current_price", "bid_count", "last_bid_at").get(pk=bid_on.pk),
+            {"current_price": 30, "bid_count": 1, "last_bid_at": linked.created_at},
+        )
+        self.assertEqual(
+            Listing.objects.values("current_price", "bid_count", "last_bid_at").get(pk=unbid.pk),
+            {"current_price": 10, "bid_count": 0, "last_bid_at": None},
+        )
+
+
+class BidConcurrencyTests(TransactionTestCase):
+    """Bids racing from several threads, each on a connection of its own, as under a threaded server."""
+
+    THREADS = 4
+    BIDS_PER_THREAD = 10
+
+    def test_racing_bids_keep_the_ledger_rising_and_end_on_the_highest(self):
+        bidder = User.objects.create_user("pia", "pia@example.com", "password")
+        listing = AuctionListing.objects.create(
+            title="Globe", image_url="https://example.com/globe.png", owner=bidder, current_price=1
+        )
+        amounts = iter(range(2, 2 + self.THREADS * self.BIDS_PER_THREAD))
+        lock = threading.Lock()
+        accepted = []
+
+        def bid():
+            try:
+                for _ in range(self.BIDS_PER_THREAD):
+                    with lock:
+                        amount = next(amounts)
+                    try:
+                        place_bid(listing.pk, bidder, amount)
+                    except BidRejected:
+                        continue
+                    with lock:
+                        accepted.append(amount)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=bid) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # In insertion order, the ledger is the order bids were accepted in
+        ledger = list(listing.bids.order_by("pk").values_list("bid", flat=True))
+        self.assertEqual(sorted(ledger), sorted(accepted))
+        self.assertEqual(ledger, sorted(set(ledger)))
+        listing.refresh_from_db()
+        self.assertEqual((listing.current_price, listing.bid_count), (max(accepted), len(accepted)))
+
+
+class SqliteProfileTests(TestCase):
+    def test_new_connections_get_the_profile(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            # 1 is NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], -20_000)
+
+    def test_checked_in_database_keeps_its_journal(self):
+        with override_settings(AUCTIONS_SQLITE_CHECKED_IN=[connection.settings_dict["NAME"]]):
+            checked_in = connections.create_connection(connection.alias)
+            try:
+                with checked_in.cursor() as cursor:
+                    cursor.execute("PRAGMA synchronous")
+                    # 2 is FULL, SQLite's default
+                    self.assertEqual(cursor.fetchone()[0], 2)
+                    cursor.execute("PRAGMA cache_size")
+                    self.assertEqual(cursor.fetchone()[0], -20_000)
+            finally:
+                checked_in.close()
+
+
+# A TestCase would hold every test in a transaction, which keeps all reads on the primary
+@override_settings(AUCTIONS_READ_REPLICAS=["replica1"])
+class ReplicaRoutingTests(TransactionTestCase):
+    def read_database(self, request):
+        seen = {}
+
+        def view(request):
+            seen["listings"] = AuctionListing.objects.all().db
+            seen["sessions"] = router.db_for_read(Session)
+            with transaction.atomic():
+                seen["in_transaction"] = AuctionListing.objects.all().db
+            with routers.primary():
+                seen["cache_fill"] = AuctionListing.objects.all().db
+            return HttpResponse()
+
+        response = routers.ReplicaMiddleware(view)(request)
+        return seen, response
+
+    def test_reads_of_a_get_go_to_the_replica(self):
+        seen, response = self.read_database(RequestFactory().get("/"))
+        self.assertEqual(seen, {
+            "listings": "replica1", "sessions": "default", "in_transaction": "default", "cache_fill": "default",
+        })
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+        # Outside a request, such as in a management command, reads use the primary
+        self.assertEqual(AuctionListing.objects.all().db, "default")
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        seen, response = self.read_database(RequestFactory().post("/"))
+        self.assertEqual(seen["listings"], "default")
+        sticky = response.cookies[routers.STICKY_COOKIE]
+        self.assertEqual(sticky["max-age"], settings.AUCTIONS_REPLICA_STICKY_SECONDS)
+
+        request = RequestFactory().get("/")
+        request.COOKIES[routers.STICKY_COOKIE] = sticky.value
+        self.assertEqual(self.read_database(request)[0]["listings"], "default")
+
+    def test_writes_go_to_the_primary(self):
+        self.assertEqual(router.db_for_write(AuctionListing), "default")
+        self.assertFalse(router.allow_migrate("replica1", "auctions"))
+
+    @override_settings(AUCTIONS_READ_REPLICAS=[])
+    def test_nothing_changes_without_replicas(self):
+        seen, response = self.read_database(RequestFactory().post("/"))
+        self.assertEqual(seen["listings"], "default")
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+
+class SessionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("sam", "sam@example.com", "password")
+        cls.bidder = User.objects.create_user("tia", "tia@example.com", "password")
+        cls.listing = AuctionListing.objects.create(
+            title="Kettle", image_url="https://example.com/kettle.png", owner=cls.owner, current_price=5
+        )
+
+    def setUp(self):
+        self.client.force_login(self.bidder)
+
+    def test_bid_and_redirect_leave_the_session_table_alone(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post(reverse("add_bid", args=(self.listing.pk,)), {"starting_bid": 10}, follow=True)
+        self.assertContains(response, "Bid was updated successfully.")
+        self.assertEqual([query["sql"] for query in captured if "django_session" in query["sql"]], [])
+
+    def test_logout_ends_the_cached_session(self):
+        self.client.get(reverse("logout"))
+        self.assertRedirects(self.client.get(reverse("watchlist")), reverse("login"), fetch_redirect_response=False)
+
+    def test_tests_keep_sessions_out_of_the_development_cache(self):
+        self.assertFalse(caches[settings.SESSION_CACHE_ALIAS]._dir.startswith(str(settings.BASE_DIR)))
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_avoid_full_table_scans(self):
+        for name in query_plans.HOT_QUERIES:
+            with self.subTest(query=name):
+                self.assertEqual(query_plans.full_scans(query_plans.explain(name)), [])
+
+
+class CloseAuctionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("grace", "grace@example.com", "password")
+        cls.bidders = [User.objects.create_user(f"bidder{index}") for index in range(3)]
+
+    def setUp(self):
+        self.listing = AuctionListing.objects.create(
+            title="Lamp", image_url="https://example.com/lamp.png", owner=self.owner, current_price=5
+        )
+
+    def test_closes_with_top_bidder_and_empty_watchlist(self):
+        for amount, bidder in enumerate(self.bidders, start=10):
+            place_bid(self.listing.pk, bidder, amount)
+            self.listing.watchlist.add(bidder)
+
+        # Update, fetch the closed ids, fetch the watchers, delete the watchlist rows,
+        # plus the savepoint around them
+        with self.assertNumQueries(6):
+            self.assertEqual(close_listings([self.listing.pk]), [self.listing.pk])
+
+        self.listing.refresh_from_db()
+        self.assertFalse(self.listing.is_active)
+        self.assertEqual(self.listing.winner, self.bidders[-1])
+        self.assertIsNotNone(self.listing.closed_at)
+        self.assertFalse(self.listing.watchlist.exists())
+
+    def test_closing_twice_is_a_no_op(self):
+        close_listings([self.listing.pk])
+        closed_at = AuctionListing.objects.get(pk=self.listing.pk).closed_at
+        self.assertEqual(close_listings([self.listing.pk]), [])
+        self.assertEqual(AuctionListing.objects.get(pk=self.listing.pk).closed_at, closed_at)
+
+    def test_only_the_owner_can_close(self):
+        self.client.force_login(self.bidders[0])
+        self.client.post(reverse("close_auction", args=(self.listing.pk,)))
+        self.assertTrue(AuctionListing.objects.get(pk=self.listing.pk).is_active)
+
+
+class AuctionExpiryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("heidi", "heidi@example.com", "password")
+
+    def create_listing(self, ends_in):
+        return AuctionListing.objects.create(
+            title="Clock", image_url="https://example.com/clock.png", owner=self.owner,
+            ends_at=timezone.now() + ends_in,
+        )
+
+    def test_closes_only_expired_auctions_in_batches(self):
+        expired = [self.create_listing(timedelta(minutes=-minutes)) for minutes in (1, 2, 3)]
+        running = self.create_listing(timedelta(hours=1))
+
+        self.assertCountEqual(close_expired_listings(batch_size=2), [expired[2].pk, expired[1].pk])
+        self.assertEqual(close_expired_listings(batch_size=2), [expired[0].pk])
+        self.assertEqual(close_expired_listings(batch_size=2), [])
+        self.assertTrue(AuctionListing.objects.get(pk=running.pk).is_active)
+
+    def test_rejects_bids_after_the_end_time(self):
+        listing = self.create_listing(timedelta(seconds=-1))
+        with self.assertRaisesMessage(BidRejected, "no longer active"):
+            place_bid(listing.pk, self.owner, 100)
+
+    def test_worker_runs_until_nothing_is_due(self):
+        expired = self.create_listing(timedelta(minutes=-1))
+        # Under SQLite a worker whose batch another worker closed first gets back nothing
+        batches = [lambda batch_size: [], close_expired_listings]
+        with mock.patch(
+            "auctions.management.commands.close_expired_auctions.close_expired_listings",
+            side_effect=lambda batch_size: batches.pop(0)(batch_size),
+        ):
+            call_command("close_expired_auctions", "--once", stdout=io.StringIO())
+        self.assertFalse(AuctionListing.objects.get(pk=expired.pk).is_active)
+
+
+
+
+class WatchlistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("mia", "mia@example.com", "password")
+        cls.watchers = User.objects.bulk_create(User(username=f"watcher{index}") for index in range(50))
+
+    def setUp(self):
+        cache.clear()
+        self.listing = AuctionListing.objects.create(
+            title="Drum", image_url="https://example.com/drum.png", owner=self.owner
+        )
+
+    def watcher_count(self):
+        return AuctionListing.objects.values_list("watcher_count", flat=True).get(pk=self.listing.pk)
+
+    def test_watch_and_unwatch_maintain_the_count(self):
+        user = self.watchers[0]
+        self.assertTrue(watchlist.watch(user, self.listing.pk))
+        self.assertFalse(watchlist.watch(user, self.listing.pk))
+        self.assertEqual(self.watcher_count(), 1)
+        self.assertTrue(watchlist.is_watching(user, self.listing.pk))
+
+        self.assertTrue(watchlist.unwatch(user, self.listing.pk))
+        self.assertFalse(watchlist.unwatch(user, self.listing.pk))
+        self.assertEqual(self.watcher_count(), 0)
+        self.assertFalse(watchlist.is_watching(user, self.listing.pk))
+
+    def test_watching_a_missing_listing_fails(self):
+        with self.assertRaises(AuctionListing.DoesNotExist):
+            watchlist.watch(self.owner, self.listing.pk + 1)
+
+    def test_membership_check_does_not_load_watchers(self):
+        self.listing.watchlist.add(*self.watchers)
+        with self.assertNumQueries(1) as context:
+            self.assertTrue(watchlist.is_watching(self.watchers[-1], self.listing.pk))
+        self.assertIn("LIMIT 1", context.captured_queries[0]["sql"])
+
+    def test_watched_ids_are_cached_until_the_watchlist_changes(self):
+        user = self.watchers[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            watchlist.watch(user, self.listing.pk)
+        self.assertEqual(watchlist.watched_ids(user), {self.listing.pk})
+        with self.assertNumQueries(0):
+            watchlist.watched_ids(user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            watchlist.unwatch(user, self.listing.pk)
+        self.assertEqual(watchlist.watched_ids(user), set())
+
+    def test_closing_clears_counts_and_cached_ids(self):
+        user = self.watchers[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            watchlist.watch(user, self.listing.pk)
+        self.assertEqual(watchlist.watched_ids(user), {self.listing.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            close_listings([self.listing.pk])
+        self.assertEqual(self.watcher_count(), 0)
+        self.assertEqual(watchlist.watched_ids(user), set())
+
+    def test_manager_changes_are_counted(self):
+        self.listing.watchlist.add(*self.watchers[:3])
+        self.assertEqual(self.watcher_count(), 3)
+        self.watchers[0].listing_watchlist.remove(self.listing)
+        self.assertEqual(self.watcher_count(), 2)
+        self.assertEqual(watchlist.watched_ids(self.watchers[1]), {self.listing.pk})
+        self.listing.watchlist.clear()
+        self.assertEqual(self.watcher_count(), 0)
+        self.assertEqual(watchlist.watched_ids(self.watchers[1]), set())
+
+    def test_category_page_revalidates_when_the_watchlist_changes(self):
+        category = Category.objects.create(category_name="Music")
+        AuctionListing.objects.filter(pk=self.listing.pk).update(category=category)
+        user = self.watchers[0]
+        self.client.force_login(user)
+        url = reverse("category", args=(category.pk,))
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            watchlist.watch(user, self.listing.pk)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["watched_ids"], [self.listing.pk])
+
+
+
+@override_settings(AUCTIONS_PAGE_SIZE=2)
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("nina", "nina@example.com", "password")
+        cls.bidder = User.objects.create_user("otto", "otto@example.com", "password")
+        cls.category = Category.objects.create(category_name="Art")
+        cls.listings = [
+            AuctionListing.objects.create(
+                title=f"Print {index}", image_url="https://example.com/print.png", owner=cls.owner,
+                category=cls.category, current_price=10,
+            )
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_listings_are_paginated_values(self):
+        response = self.client.get(reverse("api_listings"))
+        payload = response.json()
+        self.assertEqual([row["id"] for row in payload["results"]], [listing.pk for listing in self.listings[:2]])
+        self.assertEqual(set(payload["results"][0]), {*LISTING_FIELDS, "price", "category_name", "owner_name"})
+        self.assertEqual(payload["results"][0]["owner_name"], "nina")
+
+        payload = self.client.get(payload["next"]).json()
+        self.assertEqual([row["id"] for row in payload["results"]], [self.listings[2].pk])
+        self.assertIsNone(payload["next"])
+
+    def test_listings_revalidate_until_a_bid_lands(self):
+        url = reverse("api_listings")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            place_bid(self.listings[0].pk, self.bidder, 20)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_listing_detail(self):
+        url = reverse("api_listing", args=(self.listings[0].pk,))
+        response = self.client.get(url)
+        self.assertEqual(response.json()["price"], 10)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(self.client.get(reverse("api_listing", args=(0,))).status_code, 404)
+
+    def test_bids(self):
+        url = reverse("api_bids", args=(self.listings[0].pk,))
+        self.assertEqual(self.client.post(url, {"amount": 20}).status_code, 401)
+
+        self.client.force_login(self.bidder)
+        response = self.client.post(url, {"amount": 20}, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["amount"], 20)
+        self.assertEqual(self.client.post(url, {"amount": 15}).status_code, 409)
+        self.assertEqual(self.client.post(url, {"amount": "lots"}).status_code, 400)
+        for amount in (10**23, "\u00b2", 2.5, True):
+            with self.subTest(amount=amount):
+                response = self.client.post(url, {"amount": amount}, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+
+    def test_comments(self):
+        url = reverse("api_comments", args=(self.listings[0].pk,))
+        self.client.force_login(self.bidder)
+        response = self.client.post(url, {"message": "Lovely"}, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.post(url, {"message": " "}).status_code, 400)
+
+        response = self.client.get(url)
+        [result] = response.json()["results"]
+        self.assertEqual(
+            (result["id"], result["message"], result["author_name"]), (Comment.objects.get().pk, "Lovely", "otto")
+        )
+        self.assertIn("created_at", result)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_comments_revalidate_after_a_delete(self):
+        url = reverse("api_comments", args=(self.listings[0].pk,))
+        older, _ = (Comment.objects.create(author=self.bidder, listing=self.listings[0], message=text) for text in "ab")
+        etag = self.client.get(url)["ETag"]
+        older.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["message"] for result in response.json()["results"]], ["b"])
+
+    def test_comments_etag_only_on_reads_of_a_listing(self):
+        self.client.force_login(self.bidder)
+        response = self.client.post(reverse("api_comments", args=(self.listings[0].pk,)), {"message": "Hi"})
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("ETag", response)
+        response = self.client.get(reverse("api_comments", args=(0,)), HTTP_IF_NONE_MATCH='"0"')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("ETag", response)
+
+    def test_watch_toggle(self):
+        url = reverse("api_watch", args=(self.listings[0].pk,))
+        self.client.force_login(self.bidder)
+        self.assertEqual(self.client.post(url).json(), {"watching": True})
+        detail = self.client.get(reverse("api_listing", args=(self.listings[0].pk,))).json()
+        self.assertEqual((detail["watching"], detail["watcher_count"]), (True, 1))
+        self.assertEqual(self.client.delete(url).json(), {"watching": False})
+        self.assertFalse(watchlist.is_watching(self.bidder, self.listings[0].pk))
+
+
+class BulkImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("sam", "sam@example.com", "password")
+        cls.category = Category.objects.create(category_name="Books")
+
+    def import_csv(self, text, **options):
+        errors = []
+        rows = bulk.read_rows(io.StringIO(text), "csv")
+        result = bulk.import_listings(rows, self.seller, on_error=lambda *error: errors.append(error), **options)
+        return result, errors
+
+    def test_imports_in_chunks_and_reports_bad_lines(self):
+        text = (
+            "title,description,image_url,price,category,ends_at\n"
+            "Atlas,Maps,https://example.com/a.png,12,books,\n"
+            ",Nothing,https://example.com/b.png,5,Books,\n"
+            "Globe,Round,not a url,5,Books,\n"
+            "Kite,Flies,https://example.com/k.png,3,Toys,\n"
+            "Novel,Long,https://example.com/n.png,7,BOOKS,2000-01-01T00:00:00\n"
+            "Diary,Blank,https://example.com/d.png,4,Books,\n"
+        )
+        with self.assertNumQueries(7):
+            # The category map, then a transaction with one INSERT for each of two chunks
+            (created, rejected), errors = self.import_csv(text, chunk_size=3)
+        self.assertEqual((created, rejected), (2, 4))
+        self.assertEqual([line for line, _ in errors], [3, 4, 5, 6])
+        self.assertIn("unknown category 'Toys'", errors[2][1])
+        self.assertEqual(
+            list(self.category.listings.values_list("title", "owner__username")), [("Atlas", "sam"), ("Diary", "sam")]
+        )
+
+    def test_reports_prices_that_are_not_digits_int_accepts(self):
+        (created, rejected), errors = self.import_csv(
+            "title,description,image_url,price,category\n"
+            "Atlas,Maps,https://example.com/a.png,\u00b2,Books\n"
+            "Diary,Blank,https://example.com/d.png,4,Books\n"
+        )
+        self.assertEqual((created, rejected), (1, 1))
+        self.assertEqual(errors[0][0], 2)
+        self.assertIn("price must be a whole number", errors[0][1])
+
+    def test_reports_prices_too_large_to_store(self):
+        rows = bulk.read_rows(io.StringIO(
+            '{"title": "Atlas", "description": "Maps", "image_url": "https://example.com/a.png", '
+            '"price": 99999999999999999999, "category": "Books"}\n'
+            '{"title": "Diary", "description": "Blank", "image_url": "https://example.com/d.png", '
+            '"price": 4, "category": "Books"}\n'
+        ), "jsonl")
+        errors = []
+        self.assertEqual(bulk.import_listings(rows, self.seller, on_error=lambda *error: errors.append(error)), (1, 1))
+        self.assertEqual(errors[0][0], 1)
+        self.assertIn("price must be a whole number", errors[0][1])
+        self.assertEqual(list(AuctionListing.objects.values_list("title", flat=True)), ["Diary"])
+
+    def test_creates_missing_categories_on_request(self):
+        (created, _), errors = self.import_csv(
+            "title,description,image_url,price,category\nKite,Flies,https://example.com/k.png,3,Toys\n",
+            create_categories=True,
+        )
+        self.assertEqual((created, errors), (1, []))
+        self.assertEqual(registry.get(AuctionListing.objects.get().category_id).category_name, "Toys")
+
+    def test_invalidates_the_grids_bulk_create_does_not_signal(self):
+        versions = [caching.get_version(caching.ACTIVE_LISTINGS), caching.get_version(caching.category_scope(self.category.pk))]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_csv("title,description,image_url,price,category\nAtlas,Maps,https://example.com/a.png,1,Books\n")
+        self.assertNotEqual(
+            [caching.get_version(caching.ACTIVE_LISTINGS), caching.get_version(caching.category_scope(self.category.pk))],
+            versions,
+        )
+
+    def test_export_reads_back_as_an_import(self):
+        AuctionListing.objects.create(
+            title="Atlas", description="Maps", image_url="https://example.com/a.png", current_price=12,
+            category=self.category, owner=self.seller,
+        )
+        output = io.StringIO()
+        call_command("export_listings", format="jsonl", stdout=output)
+        [row] = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual((row["title"], row["price"], row["category"], row["owner"]), ("Atlas", 12, "Books", "sam"))
+
+        rows = bulk.read_rows(io.StringIO(output.getvalue()), "jsonl")
+        self.assertEqual(bulk.import_listings(rows, self.seller), (1, 0))
+
+
+class SyntheticDataTests(TestCase):
+    def test_seeded_listings_agree_with_their_bids_and_watchers(self):
+        counts = synthetic.seed(300, chunk_size=100)
+        self.assertEqual(counts["listings"], AuctionListing.objects.count())
+        self.assertFalse(drifted_listings().exists())
+        stored = dict(AuctionListing.objects.values_list("id", "watcher_count"))
+        watchlist.recount_watchers(list(stored))
+        self.assertEqual(dict(AuctionListing.objects.values_list("id", "watcher_count")), stored)
+        self.assertFalse(AuctionListing.objects.closed().filter(watcher_count__gt=0).exists())
+
+
+class ClosedAuctionExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("fin", "fin@example.com", "password", is_staff=True)
+        seller = User.objects.create_user("sid", "sid@example.com", "password")
+        bidder = User.objects.create_user("bo", "bo@example.com", "password")
+        category = Category.objects.create(category_name="Clocks")
+        cls.sold = AuctionListing.objects.create(
+            title="Cuckoo", image_url="https://example.com/c.png", owner=seller, category=category, current_price=5
+        )
+        place_bid(cls.sold.pk, bidder, 9)
+        place_bid(cls.sold.pk, bidder, 11)
+        cls.unsold = AuctionListing.objects.create(title="Alarm", image_url="https://example.com/a.png", owner=seller)
+        AuctionListing.objects.create(title="Still open", image_url="https://example.com/o.png", owner=seller)
+        close_listings([cls.sold.pk, cls.unsold.pk])
+
+    def test_streams_closed_auctions_as_csv(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("closed_auctions_export"))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,title,category,owner,winner,final_price,bid_count,closed_at")
+        self.assertEqual([line.split(",")[:7] for line in lines[1:]], [
+            [str(self.sold.pk), "Cuckoo", "Clocks", "sid", "bo", "11", "2"],
+            [str(self.unsold.pk), "Alarm", "", "sid", "", "0", "0"],
+        ])
+
+    def test_requires_staff(self):
+        self.client.force_login(User.objects.get(username="bo"))
+        response = self.client.get(reverse("closed_auctions_export"))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_streams_asynchronously_under_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.staff)
+        response = await self.async_client.get(reverse("closed_auctions_export"), {"format": "jsonl"})
+        self.assertTrue(response.is_async)
+        rows = [json.loads(line) async for block in response.streaming_content for line in block.splitlines()]
+        self.assertEqual([(row["title"], row["winner"]) for row in rows], [("Cuckoo", "bo"), ("Alarm", None)])
+
+    def test_command(self):
+        output = io.StringIO()
+        call_command("export_closed_auctions", format="jsonl", stdout=output)
+        self.assertEqual([json.loads(line)["final_price"] for line in output.getvalue().splitlines()], [11, 0])
+
+
+class RequestTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("ops", "ops@example.com", "password", is_staff=True)
+        cls.listing = AuctionListing.objects.create(title="Vase", image_url="https://example.com/v.png", owner=cls.staff)
+
+    def setUp(self):
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+        self.client.force_login(self.staff)
+
+    def test_histogram_percentiles_are_within_five_percent(self):
+        histogram = instrumentation.Histogram()
+        for value in range(1, 1001):
+            histogram.add(value)
+        for percent in (50, 95, 99):
+            self.assertAlmostEqual(histogram.percentile(percent), percent * 10, delta=percent * 10 * 0.05)
+        self.assertEqual(histogram.percentile(100), 1000)
+
+    def test_records_queries_templates_and_size_per_route(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("listing", args=(self.listing.pk,)))
+        self.assertRegex(
+            response["Server-Timing"],
+            rf'^db;dur=[\d.]+;desc="{len(queries)} queries", tpl;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+        figures = instrumentation.snapshot()["listing"]
+        self.assertEqual(figures["queries"]["count"], 1)
+        self.assertEqual(figures["queries"]["max"], len(queries))
+        self.assertEqual(figures["bytes"]["max"], len(response.content))
+        self.assertGreater(figures["template_ms"]["max"], 0)
+
+    @override_settings(ROOT_URLCONF="commerce.asgi_urls")
+    async def test_counts_queries_of_async_views(self):
+        await sync_to_async(cache.clear)()
+        response = await self.async_client.get(reverse("listing", args=(self.listing.pk,)))
+        self.assertIs(response.resolver_match.func, async_views.listing_view)
+        self.assertGreater(instrumentation.snapshot()["listing"]["queries"]["max"], 0)
+
+    def test_staff_page(self):
+        self.client.get(reverse("index"))
+        response = self.client.get(reverse("route_timings"))
+        self.assertContains(response, "<td>index</td>")
+        self.assertEqual(self.client.get(reverse("route_timings"), {"format": "json"}).json()["index"]["bytes"]["count"], 1)
+        self.client.post(reverse("route_timings"))
+        self.assertEqual(list(instrumentation.snapshot()), ["route_timings"])
+
+
+@override_settings(ROOT_URLCONF="commerce.asgi_urls")
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("kim", "kim@example.com", "password")
+        owner = User.objects.create_user("leo", "leo@example.com", "password")
+        cls.category = Category.objects.create(category_name="Toys")
+        cls.listing = AuctionListing.objects.create(
+            title="Kite", image_url="https://example.com/kite.png", owner=owner, category=cls.category, current_price=3
+        )
+        cls.listing.watchlist.add(cls.user)
+        Comment.objects.create(author=owner, listing=cls.listing, message="Flies well")
+        AuctionListing.objects.create(
+            title="Yo-yo", image_url="https://example.com/yoyo.png", owner=owner, category=cls.category,
+            is_active=False,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.async_client.force_login(self.user)
+
+    async def test_read_pages_are_served_by_async_views(self):
+        pages = {
+            reverse("index"): async_views.index,
+            reverse("display"): async_views.display,
+            reverse("category", args=(self.category.pk,)): async_views.category_view,
+            reverse("listing", args=(self.listing.pk,)): async_views.listing_view,
+            reverse("watchlist"): async_views.watchlist_view,
+            reverse("closed_auctions"): async_views.closed_auctions_view,
+        }
+        for url, view in pages.items():
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIs(response.resolver_match.func, view)
+
+    async def test_listing_page(self):
+        response = await self.async_client.get(reverse("listing", args=(self.listing.pk,)))
+        self.assertTrue(response.context["check_listing_in_watchlist"])
+        self.assertFalse(response.context["is_owner"])
+        self.assertContains(response, "Flies well")
+
+    async def test_unknown_listing_is_not_found(self):
+        response = await self.async_client.get(reverse("listing", args=(self.listing.pk + 100,)))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_watchlist_requires_login(self):
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(reverse("watchlist"))
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+
+    async def test_category_filter_redirects(self):
+        response = await self.async_client.get(reverse("display"), {"category": self.category.pk})
+        self.assertRedirects(response, reverse("category", args=(self.category.pk,)), 303, fetch_redirect_response=False)
+
+    async def test_category_page_revalidates(self):
+        url = reverse("category", args=(self.category.pk,))
+        response = await self.async_client.get(url)
+        self.assertContains(response, "Kite")
+        self.assertEqual(response["Cache-Control"], "max-age=0, must-revalidate")
+        repeat = await self.async_client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_category_page_validators_match_the_sync_view(self):
+        # Either view may answer the other's revalidation
+        self.client.force_login(self.user)
+        url = reverse("category", args=(self.category.pk,))
+        async_response = self.client.get(url)
+        with override_settings(ROOT_URLCONF="commerce.urls"):
+            sync_response = self.client.get(url)
+            self.assertIs(sync_response.resolver_match.func, views.category_view)
+        self.assertEqual(async_response["ETag"], sync_response["ETag"])
+        self.assertEqual(async_response["Last-Modified"], sync_response["Last-Modified"])
+
+    async def test_unknown_category_is_not_found(self):
+        response = await self.async_client.get(reverse("category", args=(self.category.pk + 100,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_asgi_serves_sync_views_unless_asked(self):
+        from commerce import asgi
+
+        self.assertFalse(settings.AUCTIONS_ASYNC_VIEWS)
+        self.assertNotIsInstance(asgi.application.application, asgi.AsyncViewsHandler)
+
+
+class LivePriceTests(TransactionTestCase):
+    """Event streams commit-dependent data, so they need real transactions."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user("ivan", "ivan@example.com", "password")
+        self.bidder = User.objects.create_user("judy", "judy@example.com", "password")
+        self.listing = AuctionListing.objects.create(
+            title="Vase", image_url="https://example.com/vase.png", owner=self.owner, current_price=5
+        )
+
+    def open_stream(self, listing_id):
+        path = reverse("listing_events", args=(listing_id,))
+        scope = {"type": "http", "method": "GET", "path": path, "headers": []}
+        messages, disconnect = asyncio.Queue(), asyncio.Event()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b""}
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.put_nowait(message)
+
+        task = asyncio.create_task(EventStreamApp(None)(scope, receive, send))
+        return task, messages, disconnect
+
+    async def next_event(self, messages):
+        while True:
+            message = await asyncio.wait_for(messages.get(), 5)
+            body = message.get("body", b"")
+            if body.startswith(b"event: price"):
+                return body.decode()
+
+    async def test_streams_current_price_then_new_bids(self):
+        task, messages, disconnect = self.open_stream(self.listing.pk)
+        self.assertEqual((await messages.get())["status"], 200)
+        self.assertIn('"price": 5', await self.next_event(messages))
+
+        await sync_to_async(place_bid)(self.listing.pk, self.bidder, 7)
+        self.assertIn('"price": 7, "bid_count": 1', await self.next_event(messages))
+
+        # A client that goes away is unsubscribed straight away
+        disconnect.set()
+        await asyncio.wait_for(task, 5)
+        channel = pubsub.listing_channel(self.listing.pk)
+        self.assertFalse(pubsub.get_broker().has_subscribers(channel))
+
+    async def test_stream_ends_when_the_auction_closes(self):
+        task, messages, _ = self.open_stream(self.listing.pk)
+        await self.next_event(messages)
+        await sync_to_async(close_listings)([self.listing.pk])
+        self.assertIn('"is_active": false', await self.next_event(messages))
+        await asyncio.wait_for(task, 5)
+
+    async def test_unknown_listing_is_not_found(self):
+        task, messages, _ = self.open_stream(self.listing.pk + 1)
+        self.assertEqual((await messages.get())["status"], 404)
+        await task
+
+    def test_wsgi_clients_are_told_to_stop_listening(self):
+        response = self.client.get(reverse("listing_events", args=(self.listing.pk,)))
+        self.assertEqual(response.status_code, 204)
+
+
+class RedisBrokerTests(SimpleTestCase):
+    """The shared listener, fed by a stand-in for the redis.asyncio client."""
+
+    def broker(self, messages):
+        patterns = []
+
+        class PubSub:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc_info):
+                pass
+
+            async def psubscribe(self, pattern):
+                patterns.append(pattern)
+
+            async def listen(self):
+                for message in messages:
+                    yield message
+
+        client = mock.Mock(pubsub=PubSub)
+        broker = pubsub.RedisBroker.__new__(pubsub.RedisBroker)
+        pubsub.LocalBroker.__init__(broker)
+        broker._url = "redis://localhost"
+        broker._async_redis = mock.Mock(**{"Redis.from_url.return_value": client})
+        return broker, patterns
+
+    async def test_listener_skips_messages_it_cannot_decode(self):
+        channel = pubsub.listing_channel(1).encode()
+        broker, patterns = self.broker([
+            {"type": "psubscribe", "channel": b"listing:*", "data": 1},
+            {"type": "pmessage", "channel": channel, "data": b"not json"},
+            {"type": "pmessage", "channel": channel, "data": b"\xff"},
+            {"type": "pmessage", "channel": channel, "data": b'{"price": 7}'},
+        ])
+        subscription = pubsub.LocalBroker.subscribe(broker, pubsub.listing_channel(1))
+        await asyncio.wait_for(broker._listen(), 5)
+        self.assertEqual(patterns, ["listing:*"])
+        self.assertEqual(await subscription.get(timeout=1), {"price": 7})
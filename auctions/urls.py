@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.index, name="index"),
@@ -8,7 +8,11 @@ urlpatterns = [
     path("register", views.register, name="register"),
     path("create", views.create_listing, name="create_listing"),
     path("display/", views.display, name="display"),
+    path("category/<int:category_id>", views.category_view, name="category"),
+    path("search", views.search, name="search"),
     path("listing/<int:id>", views.listing_view, name="listing"),
+    path("listing/<int:id>/comments", views.listing_comments, name="listing_comments"),
+    path("listing/<int:id>/events", views.listing_events, name="listing_events"),
     path("remove_watchlist/<int:id>", views.remove_watchlist, name="remove_watchlist"),
     path("add_watchlist/<int:id>", views.add_watchlist, name="add_watchlist"),
     path("watchlist", views.watchlist_view, name="watchlist"),
@@ -16,4 +20,12 @@ urlpatterns = [
     path("add_bid/<int:id>", views.add_bid, name="add_bid"),
     path("close_auction/<int:id>", views.close_auction, name="close_auction"),
     path("closed_auctions", views.closed_auctions_view, name="closed_auctions"),
+    path("closed_auctions/export", views.closed_auctions_export, name="closed_auctions_export"),
+    path("timings", views.route_timings, name="route_timings"),
+    path("cache/stats", views.cache_stats, name="cache_stats"),
+    path("api/listings", api.listings, name="api_listings"),
+    path("api/listings/<int:id>", api.listing, name="api_listing"),
+    path("api/listings/<int:id>/bids", api.bids, name="api_bids"),
+    path("api/listings/<int:id>/comments", api.comments, name="api_comments"),
+    path("api/listings/<int:id>/watch", api.watch, name="api_watch"),
 ]
@@ -1,44 +1,82 @@
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import authenticate, login, logout
+from django.core.handlers.asgi import ASGIRequest
 from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.contrib import messages
-from .models import User, Category, AuctionListing, Comment, Bid
+from django.db.models import Count, Max
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from . import bulk, caching, categories, comments, instrumentation, watchlist
+from .events import listing_event_stream, open_listing_stream
+from .models import User, AuctionListing, Comment
+from .numbers import max_integer, parse_whole_number
+from .pagination import get_cursor, keyset_page
+from .search import search_listings
+from .services import BidRejected, close_listings, place_bid
 
 # View to display a specific auction listing
 def listing_view(request, id):
     # Retrieve the listing or return a 404 error if not found
-    listing_data = get_object_or_404(AuctionListing, pk=id)
+    listing_data = get_object_or_404(AuctionListing.objects.for_detail(), pk=id)
     # Check if the current user has the listing in their watchlist
-    check_listing_in_watchlist = request.user.is_authenticated and request.user in listing_data.watchlist.all()
-    # Get all comments for the listing
-    all_comments = Comment.objects.filter(listing=listing_data)
+    check_listing_in_watchlist = watchlist.is_watching(request.user, listing_data.pk)
+    # Get the first page of comments, with their authors joined in; the rest load on demand
+    all_comments = comments.comment_page(listing_data.pk)
     # Check if the current user is the owner of the listing
-    is_owner = request.user.is_authenticated and request.user == listing_data.owner
+    is_owner = request.user.is_authenticated and request.user.pk == listing_data.owner_id
     # Render the listing page with the relevant context
     return render(request, "auctions/listing.html", {
         "listing": listing_data,
         "check_listing_in_watchlist": check_listing_in_watchlist,
         "all_comments": all_comments,
+        "comment_count": comments.comment_count(listing_data.pk),
         "is_owner": is_owner,
     })
 
+# View to render the next page of a listing's comments for the "Load more" button
+def listing_comments(request, id):
+    return render(request, "auctions/comments_page.html", {
+        "comments": comments.comment_page(id, get_cursor(request)),
+        "listing_id": id,
+    })
+
+# View to stream live price updates for a listing as server-sent events.
+# Event streams need an ASGI server. commerce/asgi.py serves them without going
+# through this view (see EventStreamApp), so this only runs behind a plain Django
+# ASGI application. Under WSGI every stream would hold a worker thread, so the
+# browser is told to stop listening and keeps the price it was rendered with.
+async def listing_events(request, id):
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    opened = await open_listing_stream(id)
+    if opened is None:
+        raise Http404("No auction listing matches the given query.")
+    response = StreamingHttpResponse(listing_event_stream(*opened), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
 # View to close an auction listing
 def close_auction(request, id):
     # Retrieve the listing or return a 404 error if not found
-    listing_data = get_object_or_404(AuctionListing, pk=id)
+    listing_data = get_object_or_404(AuctionListing.objects.only("owner_id"), pk=id)
     # Check if the current user is the owner of the listing
-    if request.user.is_authenticated and request.user.username == listing_data.owner.username:
-        # Remove the listing from all users' watchlists
-        for user in listing_data.watchlist.all():
-            user.listing_watchlist.remove(listing_data)
-        
-        # Mark the listing as inactive
-        listing_data.is_active = False
-        listing_data.save()
-        
-        messages.success(request, "Congratulations! You have ended this auction.")
+    if request.user.is_authenticated and request.user.pk == listing_data.owner_id:
+        # Close the auction, pick the winner and clear every watchlist in one transaction
+        if close_listings([listing_data.pk]):
+            messages.success(request, "Congratulations! You have ended this auction.")
+        else:
+            messages.error(request, "This auction has already ended.")
     else:
         messages.error(request, "You do not have permission to close this auction.")
     
@@ -47,23 +85,24 @@ def close_auction(request, id):
 
 # View to add a new bid to an auction listing
 def add_bid(request, id):
-    # Retrieve the listing or return a 404 error if not found
-    listing_data = get_object_or_404(AuctionListing, pk=id)
-    # Check if the current user is the owner of the listing
-    is_owner = request.user.is_authenticated and request.user.username == listing_data.owner.username
-    # Get the new bid amount from the POST request
-    new_bid = request.POST.get('starting_bid')
-    
-    # Check if the new bid is valid and higher than the current bid
-    if new_bid and int(new_bid) > listing_data.starting_bid.bid:
-        updated_bid = Bid(user=request.user, bid=int(new_bid))
-        updated_bid.save()
-        listing_data.starting_bid = updated_bid
-        listing_data.save()
-        messages.success(request, "Bid was updated successfully.")
-    else:
+    # Get the new bid amount from the POST request, as a whole number the database can store
+    new_bid = parse_whole_number(request.POST.get('starting_bid', ''))
+
+    if not request.user.is_authenticated:
+        messages.error(request, "You need to be logged in to place a bid.")
+    elif new_bid is None:
         messages.error(request, "Bid update failed. Ensure your bid is higher than the current bid.")
-    
+    else:
+        # The bid service compares and swaps the current bid in one transaction
+        try:
+            place_bid(id, request.user, new_bid)
+        except AuctionListing.DoesNotExist:
+            raise Http404("No auction listing matches the given query.")
+        except BidRejected as error:
+            messages.error(request, str(error))
+        else:
+            messages.success(request, "Bid was updated successfully.")
+
     # Redirect to the listing page
     return HttpResponseRedirect(reverse("listing", args=(id, )))
 
@@ -94,7 +133,7 @@ def add_comment(request, id):
 def watchlist_view(request):
     if request.user.is_authenticated:
         # Fetch only active listings for the current user
-        listings = request.user.listing_watchlist.filter(is_active=True)
+        listings = AuctionListing.objects.active().filter(watchlist=request.user).cards()
         return render(request, "auctions/watchlist.html", {
             "listings": listings
         })
@@ -105,9 +144,9 @@ def watchlist_view(request):
 # View to remove an auction listing from the current user's watchlist
 def remove_watchlist(request, id):
     # Retrieve the listing or return a 404 error if not found
-    listing_data = get_object_or_404(AuctionListing, pk=id)
+    get_object_or_404(AuctionListing.objects.only("id"), pk=id)
     if request.user.is_authenticated:
-        listing_data.watchlist.remove(request.user)
+        watchlist.unwatch(request.user, id)
         messages.success(request, "Removed from watchlist.")
     else:
         messages.error(request, "You need to be logged in to remove from watchlist.")
@@ -117,53 +156,225 @@ def remove_watchlist(request, id):
 
 # View to add an auction listing to the current user's watchlist
 def add_watchlist(request, id):
-    # Retrieve the listing or return a 404 error if not found
-    listing_data = get_object_or_404(AuctionListing, pk=id)
     if request.user.is_authenticated:
-        listing_data.watchlist.add(request.user)
+        # The watchlist service adds the row and bumps the watcher count together
+        try:
+            watchlist.watch(request.user, id)
+        except AuctionListing.DoesNotExist:
+            raise Http404("No auction listing matches the given query.")
         messages.success(request, "Added to watchlist.")
     else:
+        get_object_or_404(AuctionListing.objects.only("id"), pk=id)
         messages.error(request, "You need to be logged in to add to watchlist.")
     
     # Redirect to the listing page
     return HttpResponseRedirect(reverse("listing", args=(id, )))
 
+# Render one page of a listing grid, or serve it from the fragment cache.
+# The cached value also records how many cards the page holds for the page heading.
+def _cached_grid(request, template_name, scopes, listings):
+    after = get_cursor(request)
+
+    def render_grid():
+        page = keyset_page(listings, after)
+        html = render_to_string(template_name, {
+            "listings": page,
+            "closed_listings": page,
+        }, request=request)
+        return {"html": html, "count": len(page)}
+
+    return caching.get_or_render(template_name, scopes, (scopes, after), render_grid)
+
+
 # View to display all active auction listings and categories on the homepage
 def index(request):
-    active_listings = AuctionListing.objects.filter(is_active=True)
-    all_categories = Category.objects.all()
+    grid = _cached_grid(
+        request, "auctions/index_grid.html", [caching.ACTIVE_LISTINGS], AuctionListing.objects.active().cards()
+    )
     return render(request, "auctions/index.html", {
-        "listings": active_listings,
-        "categories": all_categories,
+        "grid": grid,
+        # The cached grid is the same for everyone; hearts are marked in the browser
+        "watched_ids": sorted(watchlist.watched_ids(request.user)),
     })
 
 
-# View to filter auction listings based on category
-def display(request):
-    selected_category = None
-    if request.method == "POST":
-        category_id = request.POST.get('category')
-        if category_id:
-            selected_category = category_id
-            category = get_object_or_404(Category, id=category_id)
-            active_listings = AuctionListing.objects.filter(is_active=True, category=category)
-        else:
-            active_listings = AuctionListing.objects.filter(is_active=True)
+# Render the category browsing page, for every category or just one
+def _render_display(request, category=None):
+    if category is not None:
+        active_listings = AuctionListing.objects.active().filter(category=category).cards()
+        scopes = [caching.category_scope(category.id)]
     else:
-        active_listings = AuctionListing.objects.filter(is_active=True)
+        active_listings = AuctionListing.objects.active().cards()
+        scopes = [caching.ACTIVE_LISTINGS]
 
-    all_categories = Category.objects.all()
     return render(request, "auctions/display.html", {
-        "listings": active_listings,
-        "categories": all_categories,
-        "selected_category": selected_category,
+        "grid": _cached_grid(request, "auctions/display_grid.html", scopes, active_listings),
+        "categories": categories.registry.all(),
+        "selected_category": category,
+        "watched_ids": sorted(watchlist.watched_ids(request.user)),
     })
 
+
+# View to browse all active auction listings by category
+def display(request):
+    # Filters used to arrive by POST or ?category=; send them to the bookmarkable category URL
+    category_id = request.POST.get('category') or request.GET.get('category')
+    if category_id:
+        category = categories.registry.get(category_id)
+        if category is None:
+            raise Http404("No category matches the given query.")
+        return HttpResponseRedirect(reverse("category", args=(category.id, )), status=303)
+    return _render_display(request)
+
+
+# Validator state for a category page: how many listings the category holds and
+# when the newest of them last changed. Both come from one index-only query, which
+# runs once per request and is shared by the ETag and Last-Modified functions.
+# None for an unknown category, which leaves the view to raise its 404; the query
+# would fail on ids too large for the database to compare.
+def _category_state(request, category_id):
+    if not hasattr(request, "_category_state"):
+        request._category_state = None
+        if categories.registry.get(category_id) is not None:
+            request._category_state = AuctionListing.objects.filter(category_id=category_id).aggregate(
+                last_modified=Max("updated_at"), total=Count("id")
+            )
+    return request._category_state
+
+
+# The category page ETag, built from its validator state and the ids the user watches.
+# async_views.category_view builds its ETag here too.
+def _build_category_etag(category_id, state, user, watched_ids):
+    last_modified = state["last_modified"].timestamp() if state["last_modified"] else 0
+    # The menu lists every category, the layout differs for signed-in users and
+    # the page carries the ids of the listings the user watches
+    watched = sorted(watched_ids)
+    return "-".join(str(part) for part in (
+        category_id,
+        state["total"],
+        last_modified,
+        caching.get_version(caching.CATEGORIES),
+        "user" if user.is_authenticated else "anon",
+        zlib.crc32(repr(watched).encode()),
+    ))
+
+
+def _category_etag(request, category_id):
+    state = _category_state(request, category_id)
+    if state is None:
+        return None
+    return _build_category_etag(category_id, state, request.user, watchlist.watched_ids(request.user))
+
+
+def _category_last_modified(request, category_id):
+    state = _category_state(request, category_id)
+    return state and state["last_modified"]
+
+
+# View to filter auction listings based on category. Browsers and proxies must
+# revalidate, which costs one index-only query and answers repeat visits with a 304.
+@cache_control(max_age=0, must_revalidate=True)
+@condition(etag_func=_category_etag, last_modified_func=_category_last_modified)
+def category_view(request, category_id):
+    category = categories.registry.get(category_id)
+    if category is None:
+        raise Http404("No category matches the given query.")
+    return _render_display(request, category)
+
 # View to display all closed auction listings
 def closed_auctions_view(request):
-    closed_listings = AuctionListing.objects.filter(is_active=False)
+    grid = _cached_grid(
+        request,
+        "auctions/closed_grid.html",
+        [caching.CLOSED_LISTINGS],
+        AuctionListing.objects.closed().cards("description"),
+    )
     return render(request, "auctions/closed_auctions.html", {
-        "closed_listings": closed_listings,
+        "grid": grid,
+    })
+
+# Pull blocks from a synchronous iterator in the request's worker thread. Under ASGI
+# Django would otherwise read a synchronous streaming body into memory before sending it.
+async def _aiter_blocks(blocks):
+    blocks = iter(blocks)
+    next_block = sync_to_async(next)
+    while (block := await next_block(blocks, None)) is not None:
+        yield block
+
+# View to download every closed auction as CSV, or with ?format=jsonl as JSON lines,
+# streamed straight from the database for reporting
+@staff_member_required
+def closed_auctions_export(request):
+    format = request.GET.get("format", "csv")
+    if format not in bulk.FORMATS:
+        format = "csv"
+    blocks = bulk.join_lines(bulk.encode_rows(bulk.closed_auction_rows(), bulk.CLOSED_AUCTION_FIELDS, format))
+    if isinstance(request, ASGIRequest):
+        blocks = _aiter_blocks(blocks)
+    content_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    response = StreamingHttpResponse(blocks, content_type=f"{content_type}; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="closed-auctions.{format}"'
+    return response
+
+# View to show staff the p50/p95/p99 cost of each route handled by this process,
+# as recorded by RequestTimingMiddleware; ?format=json returns the raw figures and
+# a POST starts the counts afresh
+@staff_member_required
+def route_timings(request):
+    if request.method == "POST":
+        instrumentation.reset()
+        return HttpResponseRedirect(reverse("route_timings"))
+    routes = instrumentation.snapshot()
+    if request.GET.get("format") == "json":
+        return JsonResponse(routes)
+    return render(request, "auctions/route_timings.html", {
+        "metrics": instrumentation.METRICS,
+        "routes": [
+            (route, metrics["total_ms"]["count"], [metrics[metric] for metric in instrumentation.METRICS])
+            for route, metrics in routes.items()
+        ],
+    })
+
+# View to show staff the fragment cache hit and miss counters; ?format=json returns
+# them raw and a POST resets them. Unlike manage.py cache_stats, it reads the cache
+# of a running server, which is the only place a process-local cache keeps them.
+@staff_member_required
+def cache_stats(request):
+    if request.method == "POST":
+        caching.reset_stats()
+        return HttpResponseRedirect(reverse("cache_stats"))
+    stats = caching.get_stats()
+    if request.GET.get("format") == "json":
+        return JsonResponse(stats)
+    lookups = stats["hits"] + stats["misses"]
+    return render(request, "auctions/cache_stats.html", {
+        "stats": stats,
+        "hit_ratio": stats["hits"] / lookups if lookups else 0,
+    })
+
+# View to search auction listings by title and description
+def search(request):
+    query = request.GET.get("q", "").strip()
+    selected_category = categories.registry.get(request.GET.get("category"))
+    include_closed = request.GET.get("closed") == "1"
+    # Fetch one extra result to learn whether another page exists
+    page_size = settings.AUCTIONS_PAGE_SIZE
+    # Pages start at 1 and stop where the OFFSET would no longer fit the database
+    page = min(parse_whole_number(request.GET.get("page", "")) or 1, max_integer() // page_size)
+    results = search_listings(
+        query,
+        category_id=selected_category.id if selected_category else None,
+        active_only=not include_closed,
+        limit=page_size + 1,
+        offset=(page - 1) * page_size,
+    )
+    return render(request, "auctions/search.html", {
+        "query": query,
+        "results": results[:page_size],
+        "next_page": page + 1 if len(results) > page_size else None,
+        "categories": categories.registry.all(),
+        "selected_category": selected_category,
+        "include_closed": include_closed,
     })
 
 # View to handle the creation of a new auction listing
@@ -178,27 +389,41 @@ def create_listing(request):
         if not all([title, description, image_url, price, category_id]):
             messages.error(request, "All fields are required.")
             return render(request, "auctions/create_listing.html", {
-                "categories": Category.objects.all()
+                "categories": categories.registry.all()
             })
         
-        category_data = get_object_or_404(Category, id=category_id)
-        bid = Bid(bid=int(price), user=request.user)
-        bid.save()
+        category_data = categories.registry.get(category_id)
+        if category_data is None:
+            raise Http404("No category matches the given query.")
+
+        # The end time is optional; without one the owner closes the auction by hand
+        ends_at = None
+        if request.POST.get("ends_at"):
+            ends_at = parse_datetime(request.POST["ends_at"])
+            if ends_at is not None and timezone.is_naive(ends_at):
+                ends_at = timezone.make_aware(ends_at)
+            if ends_at is None or ends_at <= timezone.now():
+                messages.error(request, "The end time must be a date and time in the future.")
+                return render(request, "auctions/create_listing.html", {
+                    "categories": categories.registry.all()
+                })
         
+        # The opening price is the listing's current price until the first bid
         new_listing = AuctionListing(
             title=title,
             description=description,
             image_url=image_url,
-            starting_bid=bid,
+            current_price=int(price),
             category=category_data,
             owner=request.user,
+            ends_at=ends_at,
         )
         new_listing.save()
         messages.success(request, "Listing created successfully.")
         return HttpResponseRedirect(reverse("index"))
     
     return render(request, "auctions/create_listing.html", {
-        "categories": Category.objects.all()
+        "categories": categories.registry.all()
     })
 
 
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuctionListing
+from .routers import primary
+
+# The (listing, user) rows behind AuctionListing.watchlist. Django gives the pair a
+# unique index, which every membership check and insert below relies on.
+Watch = AuctionListing.watchlist.through
+
+
+def _watched_key(user_id):
+    return f"auctions:watched:{user_id}"
+
+
+# Whether the user watches the listing: one EXISTS probe of the unique
+# (listing, user) index, however many watchers the listing has
+def is_watching(user, listing_id):
+    if not user.is_authenticated:
+        return False
+    return Watch.objects.filter(auctionlisting_id=listing_id, user_id=user.pk).exists()
+
+
+async def ais_watching(user, listing_id):
+    if not user.is_authenticated:
+        return False
+    return await Watch.objects.filter(auctionlisting_id=listing_id, user_id=user.pk).aexists()
+
+
+def _watched_queryset(user):
+    return Watch.objects.filter(user_id=user.pk).values_list("auctionlisting_id", flat=True)
+
+
+# Ids of every listing the user watches, for marking whole grids at once. Loaded with
+# one query on the primary and cached per user until the user's watchlist changes.
+def watched_ids(user):
+    if not user.is_authenticated:
+        return frozenset()
+    ids = cache.get(_watched_key(user.pk))
+    if ids is None:
+        with primary():
+            ids = frozenset(_watched_queryset(user))
+        cache.set(_watched_key(user.pk), ids, settings.AUCTIONS_FRAGMENT_CACHE_TIMEOUT)
+    return ids
+
+
+async def awatched_ids(user):
+    if not user.is_authenticated:
+        return frozenset()
+    ids = cache.get(_watched_key(user.pk))
+    if ids is None:
+        with primary():
+            ids = frozenset([listing_id async for listing_id in _watched_queryset(user)])
+        cache.set(_watched_key(user.pk), ids, settings.AUCTIONS_FRAGMENT_CACHE_TIMEOUT)
+    return ids
+
+
+# Drop the cached watched ids of the given users
+def forget_watched(user_ids):
+    cache.delete_many([_watched_key(user_id) for user_id in user_ids])
+
+
+# Add a listing to the user's watchlist. Returns False if it was already there.
+def watch(user, listing_id):
+    try:
+        with transaction.atomic():
+            # Bumping the counter first locks the listing row (and takes SQLite's write
+            # lock), so the insert below and the count cannot drift apart
+            if not AuctionListing.objects.filter(pk=listing_id).update(watcher_count=F("watcher_count") + 1):
+                raise AuctionListing.DoesNotExist("No auction listing matches the given query.")
+            Watch.objects.create(auctionlisting_id=listing_id, user_id=user.pk)
+    except IntegrityError:
+        # Already watched: the unique index refused the row and the count rolled back
+        return False
+    transaction.on_commit(lambda: forget_watched([user.pk]))
+    return True
+
+
+# Remove a listing from the user's watchlist. Returns False if it was not there.
+def unwatch(user, listing_id):
+    with transaction.atomic():
+        deleted, _ = Watch.objects.filter(auctionlisting_id=listing_id, user_id=user.pk).delete()
+        if not deleted:
+            return False
+        AuctionListing.objects.filter(pk=listing_id).update(watcher_count=F("watcher_count") - 1)
+    transaction.on_commit(lambda: forget_watched([user.pk]))
+    return True
+
+
+# Recompute watcher_count of the given listings from the watchlist rows, for changes
+# made through the many-to-many manager rather than watch() and unwatch()
+def recount_watchers(listing_ids):
+    watchers = (
+        Watch.objects.filter(auctionlisting=OuterRef("pk"))
+        .order_by()
+        .values("auctionlisting")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return AuctionListing.objects.filter(pk__in=listing_ids).update(watcher_count=Coalesce(Subquery(watchers), 0))
@@ -9,8 +9,30 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'commerce.settings')
+# Each request runs in a thread of its own, so a kept connection would never be reused
+os.environ.setdefault('AUCTIONS_CONN_MAX_AGE', '0')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+
+class AsyncViewsHandler(ASGIHandler):
+    """Routes requests through commerce.asgi_urls, where the read-heavy pages have async views."""
+
+    urlconf = 'commerce.asgi_urls'
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = self.urlconf
+        return request, error_response
+
+
+# Listing event streams are served beside Django, so idle streams stay cheap
+from auctions.events import EventStreamApp  # noqa: E402
+
+application = EventStreamApp(AsyncViewsHandler() if settings.AUCTIONS_ASYNC_VIEWS else ASGIHandler())
@@ -0,0 +1,13 @@
+"""commerce URL Configuration for ASGI servers
+
+Same URLs as commerce.urls, with the auctions pages that have async views served
+by them. commerce/asgi.py selects this module for every request when
+AUCTIONS_ASYNC_VIEWS is set.
+"""
+from django.contrib import admin
+from django.urls import include, path
+
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("", include("auctions.async_urls"))
+]
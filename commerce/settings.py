@@ -41,6 +41,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the figures it records cover every other middleware too
+    'auctions.instrumentation.RequestTimingMiddleware',
+    # Ahead of everything that reads the database, sessions and users included
+    'auctions.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,7 +58,8 @@ ROOT_URLCONF = 'commerce.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django backend, timing each render for RequestTimingMiddleware
+        'BACKEND': 'auctions.instrumentation.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,12 +82,112 @@ WSGI_APPLICATION = 'commerce.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # AUCTIONS_DATABASE points a server at another file, e.g. the scratch database
+        # of bench_asgi
+        'NAME': os.environ.get('AUCTIONS_DATABASE', os.path.join(BASE_DIR, 'db.sqlite3')),
+        # Keep each worker thread's connection between requests, checking it is still
+        # usable before reuse. commerce/asgi.py turns this off: every ASGI request
+        # runs in a thread of its own, which would strand its connection.
+        'CONN_MAX_AGE': int(os.environ.get('AUCTIONS_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Seconds a connection waits for another's write lock before failing
+            # with "database is locked"
+            'timeout': 20,
+        },
+        # Tests run against a file rather than SQLite's shared in-memory database,
+        # which fails concurrent writers at once instead of making them wait
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test-db.sqlite3')},
     }
 }
 
+# Tests keep their file caches in a temporary directory, away from the development
+# server's sessions; the benchmark commands do the same (see auctions/scratch.py)
+TEST_RUNNER = 'auctions.scratch.ScratchCachesRunner'
+
+# Applied to every new SQLite connection (see auctions/signals.py). WAL lets reads
+# carry on while a bid is being written; with WAL, synchronous=NORMAL only syncs at
+# checkpoints, which cannot corrupt the database. mmap_size is in bytes, and a
+# negative cache_size is in KiB, per connection.
+AUCTIONS_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20_000,
+}
+
+# Database files that keep the journal they were committed with. The journal mode is
+# stored in the file itself, so switching the checked-in db.sqlite3 to WAL would leave
+# it modified after every manage.py command. These skip journal_mode, and the
+# synchronous setting that is only safe under WAL. Set AUCTIONS_SQLITE_WAL=1 where
+# db.sqlite3 is not the checked-in copy, e.g. on a server.
+AUCTIONS_SQLITE_CHECKED_IN = (
+    [] if os.environ.get('AUCTIONS_SQLITE_WAL') == '1' else [os.path.join(BASE_DIR, 'db.sqlite3')]
+)
+
+# Read replicas: database aliases that serve the reads of GET and HEAD requests (see
+# auctions/routers.py). Writes, and a browser's requests for
+# AUCTIONS_REPLICA_STICKY_SECONDS after a write, use 'default', so keep that longer
+# than the replicas lag behind it. AUCTIONS_REPLICAS=N sets up N local SQLite copies
+# of db.sqlite3, which `manage.py sync_replicas` refreshes.
+
+DATABASE_ROUTERS = ['auctions.routers.ReplicaRouter']
+AUCTIONS_READ_REPLICAS = []
+AUCTIONS_REPLICA_STICKY_SECONDS = 10
+
+for _number in range(1, int(os.environ.get('AUCTIONS_REPLICAS', 0)) + 1):
+    DATABASES[f'replica{_number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db-replica{_number}.sqlite3'),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': 20},
+        # Tests read the test copy of 'default' through every replica
+        'TEST': {'MIRROR': 'default'},
+    }
+    AUCTIONS_READ_REPLICAS.append(f'replica{_number}')
+
 AUTH_USER_MODEL = 'auctions.User'
 
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Grid fragments, comment counts and watched ids are invalidated by bumping versions
+# and deleting keys in whichever process made the change: a server worker, the
+# close_expired_auctions worker or import_listings. The cache must therefore be
+# shared by every process on the host, as the sessions cache is. Point both at a
+# server-wide cache (such as Redis) when the workers run on several hosts.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('AUCTIONS_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'default')),
+        'OPTIONS': {'MAX_ENTRIES': 10_000},
+    },
+    # Sessions get a cache of their own, so churning listing fragments cannot evict
+    # them. It is shared by every process on the host: a logout deletes the cached
+    # session everywhere at once. Point it at a server-wide cache (such as Redis)
+    # when the workers run on several hosts.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('AUCTIONS_SESSION_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'sessions')),
+        'OPTIONS': {'MAX_ENTRIES': 10_000},
+    },
+}
+
+# Sessions
+# https://docs.djangoproject.com/en/3.0/topics/http/sessions/
+# Sessions are read from the shared sessions cache, falling back to the database on
+# a miss, and written to both, only by requests that change them (signing in or out).
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_SAVE_EVERY_REQUEST = False
+
+# Flash messages travel in a signed cookie, so bids, comments and watchlist changes
+# never modify the session. Messages beyond the cookie's 2KB are dropped rather than
+# spilled into the session as the default storage would.
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -120,4 +225,35 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Number of listings shown per page of the home, category and closed-auction grids
+AUCTIONS_PAGE_SIZE = 24
+
+# Number of comments shown on a listing page, and loaded by each "Load more"
+AUCTIONS_COMMENTS_PAGE_SIZE = 20
+
+# Most seconds a process serves its in-memory copy of the categories before reloading
+# them, in case a change made by another process did not reach its cache
+AUCTIONS_CATEGORY_MAX_AGE = 60
+
+# Set AUCTIONS_ASYNC_VIEWS=1 to have commerce/asgi.py serve the read-heavy pages from
+# auctions/async_views.py. Off by default: on Django 4.2 every async ORM call is a
+# thread hop, and bench_asgi measures them no faster than the sync views under ASGI,
+# both at about half the throughput of the WSGI application.
+AUCTIONS_ASYNC_VIEWS = os.environ.get('AUCTIONS_ASYNC_VIEWS') == '1'
+
+# Seconds a rendered listing grid may be served from cache. Grids are invalidated as
+# soon as a listing, bid or category changes, in every process sharing the cache, so
+# this mostly bounds the space orphaned fragments take up before they expire.
+AUCTIONS_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Live price updates. Leave AUCTIONS_PUBSUB_URL unset to fan bids out in-process,
+# which is enough for a single ASGI worker; point it at a Redis-compatible server
+# (e.g. 'redis://localhost:6379/0') when several workers serve the event streams.
+AUCTIONS_PUBSUB_URL = os.environ.get('AUCTIONS_PUBSUB_URL')
+
+# Seconds between keep-alive comments on an idle event stream, and the most
+# seconds a stream stays open before the browser is told to reconnect
+AUCTIONS_EVENTS_KEEPALIVE = 15
+AUCTIONS_EVENTS_MAX_AGE = 5 * 60